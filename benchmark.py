@@ -0,0 +1,250 @@
+import sys
+import os
+import io
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from seatheap import SeatHeap
+from seatpool import SeatPool
+from minheap import MinHeap
+from bucketwaitlist import BucketWaitlist
+from treewaitlist import TreeWaitlist
+from rbtree import RedBlackTree
+from compactrbtree import CompactRedBlackTree
+from persistenttree import PersistentRedBlackTree
+from ticketengine import TicketEngine
+from commandparser import parse_commands
+from outputsink import BufferedSink, NullSink
+from workloadgen import MIXES, generate
+from gatorTicketMaster import run_commands
+
+# Every benchmark runs this many times and keeps its fastest timings
+REPEAT = 3
+
+# A timing only counts as a regression when it is this much slower than the
+# baseline and slower by at least MIN_REGRESSION_SECONDS
+TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.01
+
+
+# Time the phases of main() on the text of a workload: parsing the input,
+# running the commands with output dropped, and running them with output
+# written to a file. "write" is the difference of the last two.
+def bench_workload(text):
+    start = time.perf_counter()
+    commands = list(parse_commands(io.StringIO(text)))
+    parse = time.perf_counter() - start
+
+    start = time.perf_counter()
+    run_commands(TicketEngine(), iter(commands), NullSink())
+    run = time.perf_counter() - start
+
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        with BufferedSink(path) as sink:
+            run_commands(TicketEngine(), iter(commands), sink)
+        run_and_write = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    return {
+        "commands": len(commands),
+        "parse": parse,
+        "run": run,
+        "write": max(0.0, run_and_write - run),
+    }
+
+
+# Time n pushes and n pops on a seat structure, in random seat order
+def bench_seats(cls, n, seed):
+    rng = random.Random(seed)
+    seats = list(range(1, n + 1))
+    rng.shuffle(seats)
+    pool = cls()
+    start = time.perf_counter()
+    for seatID in seats:
+        pool.push(seatID)
+    push = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n):
+        pool.pop()
+    return {"push": push, "pop": time.perf_counter() - start}
+
+
+# Time n pushes, n priority updates and n pops on a waitlist
+def bench_waitlist(cls, n, seed):
+    rng = random.Random(seed)
+    waitlist = cls()
+    priorities = [rng.randint(1, 10) for _ in range(2 * n)]
+    start = time.perf_counter()
+    for userID in range(n):
+        waitlist.push(priorities[userID], userID, userID)
+    push = time.perf_counter() - start
+    start = time.perf_counter()
+    for userID in range(n):
+        waitlist.update_priority(userID, priorities[n + userID])
+    update = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n):
+        waitlist.pop()
+    return {"push": push, "update": update, "pop": time.perf_counter() - start}
+
+
+# Time n inserts, n searches, a full traversal and n deletes on a tree
+def bench_tree(cls, n, seed):
+    rng = random.Random(seed)
+    keys = list(range(n))
+    rng.shuffle(keys)
+    tree = cls()
+    start = time.perf_counter()
+    for key in keys:
+        tree.insert(key, key)
+    insert = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys:
+        tree.search(key)
+    search = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in tree.iter_inorder():
+        pass
+    inorder = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys:
+        tree.delete_node(key)
+    return {
+        "insert": insert,
+        "search": search,
+        "inorder": inorder,
+        "delete": time.perf_counter() - start,
+    }
+
+
+# Structures timed on their own, with the benchmark used for each. A change
+# here needs a new benchmark_baseline.json: timings missing from the baseline
+# fail the --baseline check.
+STRUCTURES = {
+    "SeatHeap": (SeatHeap, bench_seats),
+    "SeatPool": (SeatPool, bench_seats),
+    "MinHeap": (MinHeap, bench_waitlist),
+    "BucketWaitlist": (BucketWaitlist, bench_waitlist),
+    "TreeWaitlist": (TreeWaitlist, bench_waitlist),
+    "RedBlackTree": (RedBlackTree, bench_tree),
+    "CompactRedBlackTree": (CompactRedBlackTree, bench_tree),
+    "PersistentRedBlackTree": (PersistentRedBlackTree, bench_tree),
+}
+
+
+# Run a benchmark repeat times; return the fastest value of every timing
+def best_of(repeat, bench, *args):
+    runs = [bench(*args) for _ in range(repeat)]
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+# Run the whole suite and return its results as a JSON-ready dict
+def run_suite(ops, seed, mixes, repeat=REPEAT):
+    results = {
+        "python": platform.python_version(),
+        "ops": ops,
+        "seed": seed,
+        "workloads": {},
+        "structures": {},
+    }
+    for mix in mixes:
+        text = "".join(generate(mix, ops, seed))
+        results["workloads"][mix] = best_of(repeat, bench_workload, text)
+    for name, (cls, bench) in STRUCTURES.items():
+        results["structures"][name] = best_of(repeat, bench, cls, ops, seed)
+    return results
+
+
+# Yield (name, seconds) for every timing in a result dict
+def timings(results):
+    for mix, phases in results["workloads"].items():
+        for phase, seconds in phases.items():
+            if phase != "commands":
+                yield f"{mix}.{phase}", seconds
+    for structure, operations in results["structures"].items():
+        for operation, seconds in operations.items():
+            yield f"{structure}.{operation}", seconds
+
+
+# Return the (name, baseline, current) timings that regressed. A timing the
+# baseline lacks is reported too, with None as its baseline.
+def find_regressions(baseline, results, tolerance=TOLERANCE):
+    previous = dict(timings(baseline))
+    regressions = []
+    for name, seconds in timings(results):
+        before = previous.get(name)
+        if before is None:
+            regressions.append((name, None, seconds))
+        elif seconds > before * (1 + tolerance) + MIN_REGRESSION_SECONDS:
+            regressions.append((name, before, seconds))
+    return regressions
+
+
+# Parse the command line options
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="benchmark")
+    parser.add_argument("--ops", type=int, default=100000, help="commands per run")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=REPEAT,
+        help="runs per benchmark; the fastest one is kept",
+    )
+    parser.add_argument(
+        "--mix",
+        choices=sorted(MIXES),
+        action="append",
+        help="workload mix to run (repeatable; default: all)",
+    )
+    parser.add_argument("--output", metavar="PATH", help="write the results as JSON")
+    parser.add_argument(
+        "--baseline",
+        metavar="PATH",
+        help="fail when a timing regressed against these results",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="allowed slowdown against the baseline (0.25 = 25%%)",
+    )
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    results = run_suite(args.ops, args.seed, args.mix or list(MIXES), args.repeat)
+    for name, seconds in timings(results):
+        print(f"{name:32} {seconds:9.4f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline["ops"] != results["ops"]:
+            print(f"Baseline was run with --ops {baseline['ops']}", file=sys.stderr)
+            sys.exit(2)
+        regressions = find_regressions(baseline, results, args.tolerance)
+        for name, before, after in regressions:
+            if before is None:
+                print(f"MISSING BASELINE {name}: regenerate it", file=sys.stderr)
+                continue
+            print(
+                f"REGRESSION {name}: {before:.4f}s -> {after:.4f}s",
+                file=sys.stderr,
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import heapq
+from minheapnode import MinHeapNode
+from waitlistbucket import WaitlistBucket
+
+
+# Class representing the waitlist as one FIFO bucket per priority level. It is
+# a drop-in replacement for MinHeap when priorities come from a small integer
+# domain: push and pop touch a single bucket instead of sifting through a heap.
+class BucketWaitlist:
+    def __init__(self):
+        self.buckets = {}  # Maps priority to its non-empty WaitlistBucket
+        self.levels = []  # Heap of negated priorities (may hold stale levels)
+        self.queued = set()  # Priorities in levels, each held there once
+        self.user_map = {}  # Maps userID to its node
+        self.size = 0
+
+    # Add a new node to the waitlist
+    def push(self, priority, timestamp, userID):
+        node = MinHeapNode(
+            -priority, timestamp, userID
+        )  # Negative priority, same as MinHeap
+        self.user_map[userID] = node
+        self._add(node)
+        self.size += 1
+
+    # Add a node for every (priority, timestamp, userID) entry
+    def push_many(self, entries):
+        for priority, timestamp, userID in entries:
+            self.push(priority, timestamp, userID)
+
+    # Remove and return the node with highest priority (earliest timestamp on ties)
+    def pop(self):
+        if not self.size:
+            return None
+        levels = self.levels
+        while levels[0] not in self.buckets:
+            self.queued.discard(heapq.heappop(levels))  # Bucket was emptied
+        bucket = self.buckets[levels[0]]
+        node = bucket.pop()
+        if not len(bucket):
+            del self.buckets[levels[0]]
+            self.queued.discard(heapq.heappop(levels))
+        del self.user_map[node.userID]
+        self.size -= 1
+        return node
+
+    # Remove and return the first k nodes in pop order
+    def pop_many(self, k):
+        return [self.pop() for _ in range(min(k, self.size))]
+
+    # Return the node pop() would return, without removing it
+    def peek(self):
+        if not self.size:
+            return None
+        levels = self.levels
+        while levels[0] not in self.buckets:
+            self.queued.discard(heapq.heappop(levels))  # Bucket was emptied
+        return self.buckets[levels[0]].peek()
+
+    # Remove a node with the given userID from the waitlist
+    def remove(self, userID):
+        node = self.user_map.pop(userID, None)
+        if node is None:
+            return False  # User not found in waitlist
+        self._discard(node)
+        self.size -= 1
+        return True
+
+    # Update the priority of a user in the waitlist
+    def update_priority(self, userID, new_priority):
+        node = self.user_map.get(userID)
+        if node is None:
+            return False  # User not found in waitlist
+        if node.priority != -new_priority:
+            self._discard(node)
+            node.priority = -new_priority
+            self._add(node)
+        return True
+
+    # Apply update_priority to every (userID, new_priority) pair in order and
+    # return whether each user was found
+    def update_many(self, updates):
+        return [self.update_priority(userID, p) for userID, p in updates]
+
+    # Return the 1-based position of the user in pop order, or None when the
+    # user is not waiting, by counting the nodes ahead of the user in O(n)
+    def position(self, userID):
+        node = self.user_map.get(userID)
+        if node is None:
+            return None
+        key = (node.priority, node.timestamp)
+        ahead = sum((n.priority, n.timestamp) < key for n in self.user_map.values())
+        return ahead + 1
+
+    # Return the first k nodes in pop order, in O(n log k)
+    def top(self, k):
+        return heapq.nsmallest(
+            k, self.user_map.values(), key=lambda n: (n.priority, n.timestamp)
+        )
+
+    # Return the (priority, timestamp, userID) entries in pop order
+    def entries(self):
+        nodes = sorted(self.user_map.values(), key=lambda n: (n.priority, n.timestamp))
+        return [(-node.priority, node.timestamp, node.userID) for node in nodes]
+
+    # Replace the waitlist with the given (priority, timestamp, userID) entries
+    def load(self, entries):
+        self.__init__()
+        # Pushing in timestamp order keeps every bucket a plain FIFO
+        for priority, timestamp, userID in sorted(entries, key=lambda e: e[1]):
+            self.push(priority, timestamp, userID)
+
+    # Put a node in the bucket of its priority. A level whose bucket was
+    # emptied may still be in the heap; it is not pushed a second time, so
+    # the heap never holds more levels than there are distinct priorities.
+    def _add(self, node):
+        bucket = self.buckets.get(node.priority)
+        if bucket is None:
+            bucket = self.buckets[node.priority] = WaitlistBucket()
+            if node.priority not in self.queued:
+                self.queued.add(node.priority)
+                heapq.heappush(self.levels, node.priority)
+        bucket.add(node)
+
+    # Take a node out of the bucket of its priority
+    def _discard(self, node):
+        bucket = self.buckets[node.priority]
+        bucket.remove(node.userID)
+        if not len(bucket):
+            del self.buckets[node.priority]  # Its level is dropped lazily
+
+    # Return the number of nodes in the waitlist
+    def __len__(self):
+        return self.size
@@ -0,0 +1,207 @@
+import struct
+from ticketengine import TicketEngine
+from ticketresults import Reserved
+
+# Event kinds. Every event is a (kind, userID, a, b) tuple of ints:
+SEAT_ASSIGNED = 1  # a = first seat, b = number of seats
+SEAT_FREED = 2  # a = first seat, b = number of seats
+WAITLIST_JOINED = 3  # a = priority, b = section ordinal (0 = shared waitlist)
+WAITLIST_LEFT = 4  # a = b = 0
+WAITLIST_PROMOTED = 5  # a = seat given to the user, b = 0
+PRIORITY_CHANGED = 6  # a = new priority, b = 0
+
+# One line of newline-delimited JSON per event kind, filled in with the
+# sequence number, userID, a and b
+JSON_LINES = {
+    SEAT_ASSIGNED: '{{"seq": {0}, "type": "seat_assigned", '
+    '"user": {1}, "seat": {2}, "count": {3}}}\n',
+    SEAT_FREED: '{{"seq": {0}, "type": "seat_freed", '
+    '"user": {1}, "seat": {2}, "count": {3}}}\n',
+    WAITLIST_JOINED: '{{"seq": {0}, "type": "waitlist_joined", '
+    '"user": {1}, "priority": {2}, "section": {3}}}\n',
+    WAITLIST_LEFT: '{{"seq": {0}, "type": "waitlist_left", "user": {1}}}\n',
+    WAITLIST_PROMOTED: '{{"seq": {0}, "type": "waitlist_promoted", '
+    '"user": {1}, "seat": {2}}}\n',
+    PRIORITY_CHANGED: '{{"seq": {0}, "type": "priority_changed", '
+    '"user": {1}, "priority": {2}}}\n',
+}
+
+# Binary stream: a file header (magic and format version), then one batch
+# header per batch (sequence number of its first event and the number of
+# events) followed by one fixed-size record per event: kind, userID, a, b.
+# The sequence number of an event is the first one of its batch plus its
+# index in the batch.
+HEADER = struct.Struct("<8sI")
+MAGIC = b"GTMCDC\0\0"
+VERSION = 1
+BATCH = struct.Struct("<qI")
+EVENT = struct.Struct("<Bqqq")
+
+# Default number of events the ring holds before it is drained
+RING_EVENTS = 4096
+
+
+# Encode a batch of events whose first sequence number is first_seq as
+# newline-delimited JSON
+def encode_json_lines(first_seq, events):
+    lines = JSON_LINES
+    return "".join(
+        [
+            lines[kind].format(seq, userID, a, b)
+            for seq, (kind, userID, a, b) in enumerate(events, first_seq)
+        ]
+    ).encode()
+
+
+# Encode a batch of events whose first sequence number is first_seq as one
+# binary batch
+def encode_binary(first_seq, events):
+    pack = EVENT.pack
+    return BATCH.pack(first_seq, len(events)) + b"".join(
+        [pack(*event) for event in events]
+    )
+
+
+# Stream encoders selectable by name
+ENCODERS = {"ndjson": encode_json_lines, "binary": encode_binary}
+
+
+# Class representing a change stream of one engine. Events are stored in a
+# fixed ring of slots, so the stream never holds more than capacity events
+# however fast they come. Once the ring is full, push() drains it to every
+# subscriber before it takes the next event: a slow subscriber holds the
+# engine up instead of letting memory grow. Events get consecutive sequence
+# numbers from 1 on, in the order the engine made the changes.
+class ChangeFeed:
+    def __init__(self, capacity=RING_EVENTS):
+        self.ring = [None] * capacity
+        self.capacity = capacity
+        self.size = 0  # Events in the ring, in slots 0 to size - 1
+        self.drained = 0  # Events handed to the subscribers so far
+        self.subscribers = []  # Called as subscriber(first_seq, events)
+
+    # Call subscriber(first_seq, events) with every batch drained from now on
+    def subscribe(self, subscriber):
+        self.subscribers.append(subscriber)
+
+    # Add an event
+    def push(self, event):
+        self.ring[self.size] = event
+        self.size += 1
+        if self.size == self.capacity:
+            self.drain()
+
+    # Hand the events in the ring to every subscriber as one batch
+    def drain(self):
+        if not self.size:
+            return
+        events = self.ring[: self.size]
+        first_seq = self.drained + 1
+        self.drained += self.size
+        self.size = 0
+        for subscriber in self.subscribers:
+            subscriber(first_seq, events)
+
+    # Drain the remaining events
+    def close(self):
+        self.drain()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Class writing the batches of a change stream to a file, encoded by
+# encoder (one of ENCODERS). A binary file starts with its own header.
+class StreamFile:
+    def __init__(self, path, encoder=encode_json_lines):
+        self.file = open(path, "wb")
+        self.encoder = encoder
+        if encoder is encode_binary:
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+
+    # Write one batch
+    def __call__(self, first_seq, events):
+        self.file.write(self.encoder(first_seq, events))
+
+    def close(self):
+        self.file.close()
+
+
+# TicketEngine reporting every change to its state to a ChangeFeed. The
+# plain engine has no hooks at all: this subclass pushes one tuple from each
+# place a seat or a waitlist entry changes hands, so an engine without a
+# change stream runs none of it. State loaded from a snapshot is not
+# streamed; commands replayed from a write-ahead log are.
+class CapturingTicketEngine(TicketEngine):
+    def __init__(self, feed, waitlist="heap", store="rbtree"):
+        super().__init__(waitlist, store)
+        self.feed = feed
+
+    def reserve_many(self, requests):
+        results = super().reserve_many(requests)
+        if len(self.section_list) > 1:
+            return results  # Went through reserve(), already streamed
+        push = self.feed.push
+        for (userID, priority), result in zip(requests, results):
+            if result is None:
+                continue
+            if type(result) is Reserved:
+                push((SEAT_ASSIGNED, userID, result.seatID, 1))
+            else:
+                push((WAITLIST_JOINED, userID, priority, 0))
+        return results
+
+    def update_priority(self, userID, priority):
+        result = super().update_priority(userID, priority)
+        if result.updated:
+            self.feed.push((PRIORITY_CHANGED, userID, priority, 0))
+        return result
+
+    def update_priorities(self, updates):
+        results = super().update_priorities(updates)
+        if len(self.section_list) > 1:
+            return results  # Went through update_priority(), already streamed
+        push = self.feed.push
+        for userID, priority, updated in results:
+            if updated:
+                push((PRIORITY_CHANGED, userID, priority, 0))
+        return results
+
+    def _promote(self, seatID, waitlist):
+        result = super()._promote(seatID, waitlist)
+        self.feed.push((WAITLIST_PROMOTED, result.userID, seatID, 0))
+        return result
+
+    def _promote_all(self, seats, nodes):
+        promoted = super()._promote_all(seats, nodes)
+        push = self.feed.push
+        for userID, seatID in promoted:
+            push((WAITLIST_PROMOTED, userID, seatID, 0))
+        return promoted
+
+    def _assign(self, seatID, userID):
+        super()._assign(seatID, userID)
+        self.feed.push((SEAT_ASSIGNED, userID, seatID, 1))
+
+    def _unassign(self, seatID, userID):
+        super()._unassign(seatID, userID)
+        self.feed.push((SEAT_FREED, userID, seatID, 1))
+
+    def _assign_block(self, start, userID, count):
+        super()._assign_block(start, userID, count)
+        self.feed.push((SEAT_ASSIGNED, userID, start, count))
+
+    def _unassign_block(self, start, userID, count):
+        super()._unassign_block(start, userID, count)
+        self.feed.push((SEAT_FREED, userID, start, count))
+
+    def _wait(self, userID, priority, queue):
+        super()._wait(userID, priority, queue)
+        self.feed.push((WAITLIST_JOINED, userID, priority, queue.ordinal))
+
+    def _leave_waitlist(self, userID):
+        super()._leave_waitlist(userID)
+        self.feed.push((WAITLIST_LEFT, userID, 0, 0))
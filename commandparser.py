@@ -0,0 +1,206 @@
+import re
+import time
+
+# Bytes of input read per chunk
+CHUNK_SIZE = 1 << 20
+
+# Most commands grouped into one batch by coalesce_commands
+COALESCE_LIMIT = 4096
+
+# Fewest commands grouped into one batch: a batch costs a few sorts and set
+# lookups, which only pay off over a longer run
+COALESCE_MIN = 16
+
+# Argument shapes of the commands
+NO_ARGS = 0  # Arguments are ignored
+ONE_INT = 1  # The whole text between the parentheses is one integer
+TWO_INTS = 2  # The first two comma-separated fields are integers
+SEAT_RANGE = 3  # First two comma-separated fields are integers, else every seat
+PATH = 4  # The whole text between the parentheses is a file path
+THREE_INTS = 5  # The first three comma-separated fields are integers
+COUNT_SECTION = 6  # An integer, optionally followed by a section name
+RESERVE = 7  # Two integers; a third field naming a section is kept
+PATHS = 8  # One or more comma-separated file paths
+
+# Command name -> argument shape. A command is recognized when the line starts
+# with "Name(", except for PREFIX_COMMANDS below.
+COMMANDS = {
+    "Initialize": COUNT_SECTION,
+    "Available": NO_ARGS,
+    "Reserve": RESERVE,
+    "ReserveBlock": THREE_INTS,
+    "Hold": THREE_INTS,
+    "Confirm": ONE_INT,
+    "Cancel": TWO_INTS,
+    "ExitWaitlist": ONE_INT,
+    "UpdatePriority": TWO_INTS,
+    "AddSeats": COUNT_SECTION,
+    "WaitlistPosition": ONE_INT,
+    "PrintWaitlist": COUNT_SECTION,
+    "PrintReservations": SEAT_RANGE,
+    "CountReserved": TWO_INTS,
+    "NthReservation": ONE_INT,
+    "ReleaseSeats": TWO_INTS,
+    "Tick": ONE_INT,
+    "Snapshot": PATH,
+    "Restore": PATH,
+    "Simulate": PATHS,
+    "Quit": NO_ARGS,
+}
+
+# Commands recognized by their name alone, with or without parentheses
+PREFIX_COMMANDS = ("Available", "PrintReservations", "Quit")
+
+# Section names start with a letter
+SECTION_RE = re.compile(r"[A-Za-z][\w-]*\Z")
+
+
+# Return the arguments of a command as a tuple of ints, or of path strings
+# for PATH and PATHS commands; COUNT_SECTION and RESERVE commands naming a section
+# carry its name as a last string field. A malformed argument list is
+# returned as the ValueError or IndexError it raised, so each command can
+# keep its own error handling when it runs.
+def parse_args(shape, line, open_idx):
+    if shape == NO_ARGS:
+        return ()
+    if shape == PATH:
+        path = line[open_idx + 1 : line.rfind(")")].strip() if open_idx >= 0 else ""
+        return (path,) if path else ValueError("empty path")
+    if shape == PATHS:
+        body = line[open_idx + 1 : line.rfind(")")] if open_idx >= 0 else ""
+        paths = tuple(path.strip() for path in body.split(","))
+        return paths if all(paths) else ValueError("empty path")
+    body = line[open_idx + 1 : line.find(")")] if open_idx >= 0 else ""
+    try:
+        if shape == ONE_INT:
+            return (int(body),)
+        fields = body.split(",")
+        if shape == SEAT_RANGE:
+            try:
+                return (int(fields[0]), int(fields[1]))
+            except (ValueError, IndexError):
+                return ()  # Prints every reservation, as a bare prefix always did
+        if shape == COUNT_SECTION:
+            if len(fields) == 1:
+                return (int(body),)
+            section = ",".join(fields[1:]).strip()
+            if not SECTION_RE.match(section):
+                raise ValueError(f"invalid section name: {section}")
+            return (int(fields[0]), section)
+        if shape == RESERVE and len(fields) > 2:
+            # A third field that is not a section name is ignored
+            section = fields[2].strip()
+            if SECTION_RE.match(section):
+                return (int(fields[0]), int(fields[1]), section)
+        if shape == THREE_INTS:
+            return (int(fields[0]), int(fields[1]), int(fields[2]))
+        return (int(fields[0]), int(fields[1]))
+    except (ValueError, IndexError) as error:
+        return error
+
+
+# Parse one line the general way; return (name, args) or None to skip it
+def parse_line(line):
+    line = line.strip()
+    if not line or line[0] == "#":
+        return None
+    open_idx = line.find("(")
+    name = line[:open_idx] if open_idx > 0 else None
+    shape = COMMANDS.get(name)
+    if shape is None:
+        # Available, PrintReservations and Quit only need a prefix match
+        for name in PREFIX_COMMANDS:
+            if line.startswith(name):
+                shape = COMMANDS[name]
+                break
+        else:
+            return None  # Ignore unrecognized commands
+    return name, parse_args(shape, line, open_idx)
+
+
+# Tokenizes a whole chunk at once. A line in canonical form "Name(a, b)" fills
+# the name/first/second groups; any other line only fills the line group and
+# goes through parse_line.
+LINE_RE = re.compile(
+    r"^([A-Za-z]+)\((?:(-?\d+)(?:, *(-?\d+))?)?\)[ \t]*$|^([^\n]*)$", re.MULTILINE
+)
+
+
+# Yield (name, args) for every command in f_in. Blank lines, comments and
+# unrecognized commands are skipped.
+def parse_commands(f_in, chunk_size=CHUNK_SIZE):
+    commands = COMMANDS
+    findall = LINE_RE.findall
+    tail = ""
+    while tail is not None:
+        block = f_in.read(chunk_size)
+        if block:
+            # Only tokenize complete lines; carry the rest to the next chunk
+            text = tail + block
+            cut = text.rfind("\n") + 1
+            text, tail = text[:cut], text[cut:]
+        else:
+            text, tail = tail, None
+        for name, first, second, line in findall(text):
+            if name:
+                # Fast path for the canonical form
+                shape = commands.get(name)
+                if shape == TWO_INTS or shape == RESERVE or shape == SEAT_RANGE:
+                    if second:
+                        yield name, (int(first), int(second))
+                        continue
+                    if not first and shape == SEAT_RANGE:
+                        yield name, ()
+                        continue
+                elif shape == ONE_INT or shape == COUNT_SECTION:
+                    if first and not second:
+                        yield name, (int(first),)
+                        continue
+                elif shape == NO_ARGS:
+                    yield name, ()
+                    continue
+                line = f"{name}({first}, {second})" if second else f"{name}({first})"
+            if line:
+                command = parse_line(line)
+                if command is not None:
+                    yield command
+
+
+# Yield the commands, grouping each run of consecutive commands named in
+# names whose arguments are two ints into one (name, [args, ...]) batch of up
+# to limit commands. The commands of a run shorter than minimum, and every
+# other command, pass through as they are.
+def coalesce_commands(commands, names, limit=COALESCE_LIMIT, minimum=COALESCE_MIN):
+    run_name, run = None, []
+    for name, args in commands:
+        batchable = name in names and type(args) is tuple and len(args) == 2
+        if batchable and name == run_name and len(run) < limit:
+            run.append(args)
+            continue
+        if run:
+            yield from _flush_run(run_name, run, minimum)
+        if batchable:
+            run_name, run = name, [args]
+        else:
+            run_name, run = None, []
+            yield name, args
+    if run:
+        yield from _flush_run(run_name, run, minimum)
+
+
+# Yield a run of commands as one batch, or one by one when it is short
+def _flush_run(name, run, minimum):
+    if len(run) >= minimum:
+        yield name, run
+    else:
+        for args in run:
+            yield name, args
+
+
+# Parse f_in without running anything; return (commands, seconds)
+def measure_parse(f_in):
+    start = time.perf_counter()
+    count = 0
+    for _ in parse_commands(f_in):
+        count += 1
+    return count, time.perf_counter() - start
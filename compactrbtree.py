@@ -0,0 +1,558 @@
+import heapq
+from array import array
+from operator import itemgetter
+from rbnode import RedBlackNode
+from rbtree import BULK_FACTOR
+
+
+# Class representing a Red-Black Tree stored in parallel array columns. Node i
+# lives at index i of the key/value/left/right/parent/size columns, its color is
+# bit i of the color column (1 = red), and index 0 is the black NULL leaf.
+# It exposes the same API as RedBlackTree for integer keys and values, without
+# allocating one Python object per reservation.
+class CompactRedBlackTree:
+    def __init__(self):
+        self.NULL_LEAF = RedBlackNode(key=None, value=None, color="BLACK")
+        self.key = array("q", [0])  # Seat ID
+        self.value = array("q", [0])  # User ID
+        self.left = array("l", [0])
+        self.right = array("l", [0])
+        self.parent = array("l", [0])
+        self.size = array("l", [0])  # Subtree sizes; the NULL leaf stays 0
+        self.colors = bytearray(1)  # Bit-packed colors, 8 nodes per byte
+        self.root = 0
+        self.free_head = 0  # Deleted slots, chained through the parent column
+
+    # Return True if node i is red
+    def _is_red(self, i):
+        return self.colors[i >> 3] >> (i & 7) & 1
+
+    # Color node i red
+    def _set_red(self, i):
+        self.colors[i >> 3] |= 1 << (i & 7)
+
+    # Color node i black
+    def _set_black(self, i):
+        self.colors[i >> 3] &= ~(1 << (i & 7))
+
+    # Allocate a red node, reusing a deleted slot when there is one
+    def _new_node(self, key, value, parent):
+        i = self.free_head
+        if i:
+            # A key or value that does not fit raises before the slot is taken
+            self.key[i] = key
+            self.value[i] = value
+            self.free_head = self.parent[i]
+            self.left[i] = 0
+            self.right[i] = 0
+            self.parent[i] = parent
+            self.size[i] = 1
+        else:
+            i = len(self.key)
+            self.key.append(key)
+            try:
+                self.value.append(value)
+            except OverflowError:
+                del self.key[i]  # Leave the columns the same length
+                raise
+            self.left.append(0)
+            self.right.append(0)
+            self.parent.append(parent)
+            self.size.append(1)
+            if i >> 3 == len(self.colors):
+                self.colors.append(0)
+        self._set_red(i)
+        return i
+
+    # Insert a new node with the given key and value
+    def insert(self, key, value):
+        keys = self.key
+        parent = 0
+        current = self.root
+
+        # Find the correct position to insert the new node
+        while current:
+            parent = current
+            if key < keys[current]:
+                current = self.left[current]
+            elif key > keys[current]:
+                current = self.right[current]
+            else:
+                # Duplicate keys are not allowed
+                return
+        node = self._new_node(key, value, parent)
+
+        # Insert the new node
+        if not parent:
+            self.root = node
+        elif key < keys[parent]:
+            self.left[parent] = node
+        else:
+            self.right[parent] = node
+        # Every ancestor gained one node in its subtree
+        size = self.size
+        while parent:
+            size[parent] += 1
+            parent = self.parent[parent]
+        self.fix_insert(node)
+
+    # Search for a node with the given key
+    def search(self, key):
+        i = self._find(key)
+        if not i:
+            return self.NULL_LEAF
+        color = "RED" if self._is_red(i) else "BLACK"
+        return RedBlackNode(self.key[i], self.value[i], color)
+
+    # Return the index of the node with the given key, or 0
+    def _find(self, key):
+        keys = self.key
+        node = self.root
+        while node and keys[node] != key:
+            node = self.left[node] if key < keys[node] else self.right[node]
+        return node
+
+    # Delete a node with the given key
+    def delete_node(self, key):
+        z = self._find(key)
+        if not z:
+            return  # Key not found in tree
+        left, right, parent = self.left, self.right, self.parent
+
+        y = z
+        y_original_red = self._is_red(y)
+        if not left[z] or not right[z]:
+            self._shrink_ancestors(z)
+        if not left[z]:
+            x = right[z]
+            self.rb_transplant(z, right[z])
+        elif not right[z]:
+            x = left[z]
+            self.rb_transplant(z, left[z])
+        else:
+            y = self.minimum(right[z])
+            y_original_red = self._is_red(y)
+            x = right[y]
+            # y leaves its position; z's count already includes the change
+            self._shrink_ancestors(y)
+            if parent[y] == z:
+                parent[x] = y
+            else:
+                self.rb_transplant(y, right[y])
+                right[y] = right[z]
+                parent[right[y]] = y
+            self.rb_transplant(z, y)
+            left[y] = left[z]
+            parent[left[y]] = y
+            if self._is_red(z):
+                self._set_red(y)
+            else:
+                self._set_black(y)
+            self.size[y] = self.size[z]
+
+        # Put the slot on the free list
+        parent[z] = self.free_head
+        self.free_head = z
+
+        if not y_original_red:
+            self.fix_delete(x)
+
+    # Decrement the subtree size of every ancestor of node
+    def _shrink_ancestors(self, node):
+        size, parent = self.size, self.parent
+        node = parent[node]
+        while node:
+            size[node] -= 1
+            node = parent[node]
+
+    # Find the minimum node starting from the given node
+    def minimum(self, node):
+        while self.left[node]:
+            node = self.left[node]
+        return node
+
+    # Replace one subtree as a child of its parent with another subtree
+    def rb_transplant(self, u, v):
+        p = self.parent[u]
+        if not p:
+            self.root = v
+        elif u == self.left[p]:
+            self.left[p] = v
+        else:
+            self.right[p] = v
+        self.parent[v] = p
+
+    # Fix the red-black tree after insertion
+    def fix_insert(self, k):
+        left, parent = self.left, self.parent
+        is_red = self._is_red
+        while parent[k] and is_red(parent[k]):
+            p = parent[k]
+            g = parent[p]
+            if p == self.right[g]:
+                u = left[g]  # Uncle node
+                if is_red(u):
+                    # Case 1: Uncle is red
+                    self._set_black(u)
+                    self._set_black(p)
+                    self._set_red(g)
+                    k = g
+                else:
+                    if k == left[p]:
+                        # Case 2: k is left child
+                        k = p
+                        self.right_rotate(k)
+                    # Case 3: k is right child
+                    self._set_black(parent[k])
+                    self._set_red(parent[parent[k]])
+                    self.left_rotate(parent[parent[k]])
+            else:
+                u = self.right[g]  # Uncle node
+                if is_red(u):
+                    # Mirror case 1
+                    self._set_black(u)
+                    self._set_black(p)
+                    self._set_red(g)
+                    k = g
+                else:
+                    if k == self.right[p]:
+                        # Mirror case 2
+                        k = p
+                        self.left_rotate(k)
+                    # Mirror case 3
+                    self._set_black(parent[k])
+                    self._set_red(parent[parent[k]])
+                    self.right_rotate(parent[parent[k]])
+            if k == self.root:
+                break
+        self._set_black(self.root)
+
+    # Fix the red-black tree after deletion
+    def fix_delete(self, x):
+        left, right, parent = self.left, self.right, self.parent
+        is_red = self._is_red
+        while x != self.root and not is_red(x):
+            if x == left[parent[x]]:
+                s = right[parent[x]]  # Sibling node
+                if is_red(s):
+                    # Case 1
+                    self._set_black(s)
+                    self._set_red(parent[x])
+                    self.left_rotate(parent[x])
+                    s = right[parent[x]]
+                if not is_red(left[s]) and not is_red(right[s]):
+                    # Case 2
+                    self._set_red(s)
+                    x = parent[x]
+                else:
+                    if not is_red(right[s]):
+                        # Case 3
+                        self._set_black(left[s])
+                        self._set_red(s)
+                        self.right_rotate(s)
+                        s = right[parent[x]]
+                    # Case 4
+                    if is_red(parent[x]):
+                        self._set_red(s)
+                    else:
+                        self._set_black(s)
+                    self._set_black(parent[x])
+                    self._set_black(right[s])
+                    self.left_rotate(parent[x])
+                    x = self.root
+            else:
+                s = left[parent[x]]  # Sibling node
+                if is_red(s):
+                    # Mirror case 1
+                    self._set_black(s)
+                    self._set_red(parent[x])
+                    self.right_rotate(parent[x])
+                    s = left[parent[x]]
+                if not is_red(right[s]) and not is_red(left[s]):
+                    # Mirror case 2
+                    self._set_red(s)
+                    x = parent[x]
+                else:
+                    if not is_red(left[s]):
+                        # Mirror case 3
+                        self._set_black(right[s])
+                        self._set_red(s)
+                        self.left_rotate(s)
+                        s = left[parent[x]]
+                    # Mirror case 4
+                    if is_red(parent[x]):
+                        self._set_red(s)
+                    else:
+                        self._set_black(s)
+                    self._set_black(parent[x])
+                    self._set_black(left[s])
+                    self.right_rotate(parent[x])
+                    x = self.root
+        self._set_black(x)
+
+    # Left rotate the subtree rooted at x
+    def left_rotate(self, x):
+        left, right, parent = self.left, self.right, self.parent
+        y = right[x]
+        right[x] = left[y]
+        if left[y]:
+            parent[left[y]] = x
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self.root = y
+        elif x == left[p]:
+            left[p] = y
+        else:
+            right[p] = y
+        left[y] = x
+        parent[x] = y
+        self.size[y] = self.size[x]
+        self.size[x] = self.size[left[x]] + self.size[right[x]] + 1
+
+    # Right rotate the subtree rooted at x
+    def right_rotate(self, x):
+        left, right, parent = self.left, self.right, self.parent
+        y = left[x]
+        left[x] = right[y]
+        if right[y]:
+            parent[right[y]] = x
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self.root = y
+        elif x == right[p]:
+            right[p] = y
+        else:
+            left[p] = y
+        right[y] = x
+        parent[x] = y
+        self.size[y] = self.size[x]
+        self.size[x] = self.size[left[x]] + self.size[right[x]] + 1
+
+    # Lazily yield (key, value) pairs in key order, keeping an explicit stack
+    # of at most one root-to-leaf path instead of recursing
+    def iter_inorder(self):
+        keys, values, left, right = self.key, self.value, self.left, self.right
+        stack = []
+        node = self.root
+        while True:
+            while node:
+                stack.append(node)
+                node = left[node]
+            if not stack:
+                return
+            node = stack.pop()
+            yield keys[node], values[node]
+            node = right[node]
+
+    # Inorder traversal of the tree
+    def inorder(self):
+        return list(self.iter_inorder())
+
+    # Lazily yield the (key, value) pairs with lo <= key <= hi in key order,
+    # visiting only the subtrees that overlap the range
+    def iter_range(self, lo, hi):
+        keys, values, left, right = self.key, self.value, self.left, self.right
+        stack = []
+        node = self.root
+        while True:
+            while node:
+                if keys[node] < lo:
+                    # The whole left subtree is below the range
+                    node = right[node]
+                else:
+                    stack.append(node)
+                    node = left[node]
+            if not stack:
+                return
+            node = stack.pop()
+            if keys[node] > hi:
+                return
+            yield keys[node], values[node]
+            node = right[node]
+
+    # Return the (key, value) pairs with lo <= key <= hi in key order
+    def range_query(self, lo, hi):
+        return list(self.iter_range(lo, hi))
+
+    # Return the number of keys below key (or up to key when inclusive)
+    def rank(self, key, inclusive=False):
+        keys, size = self.key, self.size
+        count = 0
+        node = self.root
+        while node:
+            if key < keys[node] or (key == keys[node] and not inclusive):
+                node = self.left[node]
+            else:
+                count += size[self.left[node]] + 1
+                node = self.right[node]
+        return count
+
+    # Return the number of keys with lo <= key <= hi
+    def count_range(self, lo, hi):
+        if hi < lo:
+            return 0
+        return self.rank(hi, inclusive=True) - self.rank(lo)
+
+    # Return the (key, value) pair with the k-th smallest key (1-based)
+    def select(self, k):
+        size = self.size
+        node = self.root
+        while node:
+            left_size = size[self.left[node]]
+            if k <= left_size:
+                node = self.left[node]
+            elif k == left_size + 1:
+                return self.key[node], self.value[node]
+            else:
+                k -= left_size + 1
+                node = self.right[node]
+        return None
+
+    # Replace the tree with the given keys (sorted, unique) and their values.
+    # Node i + 1 holds keys[i], so the key and value columns are copied in
+    # bulk; the links describe a balanced tree whose last, partial level is
+    # red and every other level black.
+    def load_sorted(self, keys, values):
+        n = len(keys)
+        self.key = array("q", [0])
+        self.key.extend(keys)
+        self.value = array("q", [0])
+        self.value.extend(values)
+        left = self.left = array("l", [0]) * (n + 1)
+        right = self.right = array("l", [0]) * (n + 1)
+        parent = self.parent = array("l", [0]) * (n + 1)
+        size = self.size = array("l", [0]) * (n + 1)
+        self.colors = bytearray((n >> 3) + 1)
+        self.free_head = 0
+        self.root = (n // 2 + 1) if n else 0
+        red_depth = n.bit_length() - 1
+        stack = [(0, n, 0, 0)] if n else []  # (lo, hi, depth, parent) to build
+        while stack:
+            lo, hi, depth, up = stack.pop()
+            node = (lo + hi) // 2 + 1
+            parent[node] = up
+            size[node] = hi - lo
+            if depth == red_depth:
+                self._set_red(node)
+            if lo < node - 1:
+                left[node] = (lo + node - 1) // 2 + 1
+                stack.append((lo, node - 1, depth + 1, node))
+            if node < hi:
+                right[node] = (node + hi) // 2 + 1
+                stack.append((node, hi, depth + 1, node))
+        self._set_black(self.root)
+
+    # Insert the given keys (sorted, unique, none of them in the tree) and
+    # their values, the same three ways as RedBlackTree.insert_many
+    def insert_many(self, keys, values):
+        if not keys:
+            return
+        if not self.root:
+            self.load_sorted(keys, values)
+        elif keys[0] > self.key[self._last()]:
+            self._join(keys, values)
+        elif BULK_FACTOR * len(keys) >= self.size[self.root]:
+            merged = list(
+                heapq.merge(self.iter_inorder(), zip(keys, values), key=itemgetter(0))
+            )
+            self.load_sorted([k for k, _ in merged], [v for _, v in merged])
+        else:
+            for key, value in zip(keys, values):
+                self.insert(key, value)
+
+    # Delete the given keys (sorted, unique), rebuilding the tree from the
+    # remaining pairs when they are a large share of it
+    def delete_many(self, keys):
+        if BULK_FACTOR * len(keys) >= self.size[self.root] > 0:
+            gone = set(keys)
+            kept = [(k, v) for k, v in self.iter_inorder() if k not in gone]
+            self.load_sorted([k for k, _ in kept], [v for _, v in kept])
+        else:
+            for key in keys:
+                self.delete_node(key)
+
+    # Return the index of the node with the largest key (the tree is not empty)
+    def _last(self):
+        node = self.root
+        while self.right[node]:
+            node = self.right[node]
+        return node
+
+    # Join the keys (sorted, all above the keys of the tree) onto the tree
+    # through a red pivot node, as in RedBlackTree._join
+    def _join(self, keys, values):
+        left, right, parent, size = self.left, self.right, self.parent, self.size
+        red_depth = (len(keys) - 1).bit_length() - 1
+        high = self._build(keys, values, 1, len(keys), 0, red_depth, 0)
+        self._set_black(high)
+        low = self.root
+        low_height = self._black_height(low)
+        high_height = self._black_height(high)
+        pivot = self._new_node(keys[0], values[0], 0)
+        if low_height >= high_height:
+            # Walk down the right spine of the tree to the matching node
+            up, node, height = 0, low, low_height
+            while self._is_red(node) or height > high_height:
+                height -= not self._is_red(node)
+                up, node = node, right[node]
+            left[pivot], right[pivot] = node, high
+            if up:
+                right[up] = pivot
+            else:
+                self.root = pivot
+            grown = size[high] + 1
+        else:
+            # Walk down the left spine of the new keys to the matching node
+            up, node, height = 0, high, high_height
+            while self._is_red(node) or height > low_height:
+                height -= not self._is_red(node)
+                up, node = node, left[node]
+            left[pivot], right[pivot] = low, node
+            left[up] = pivot
+            self.root = high
+            grown = size[low] + 1
+        size[pivot] = size[left[pivot]] + size[right[pivot]] + 1
+        parent[pivot] = up
+        for child in (left[pivot], right[pivot]):
+            if child:
+                parent[child] = pivot
+        # Every ancestor of the pivot gained the other tree and the pivot
+        while up:
+            size[up] += grown
+            up = parent[up]
+        self.fix_insert(pivot)
+
+    # Allocate the nodes of a balanced subtree holding keys[lo:hi] below
+    # parent; return its root, or 0 when the range is empty
+    def _build(self, keys, values, lo, hi, depth, red_depth, parent):
+        if lo >= hi:
+            return 0
+        mid = (lo + hi) // 2
+        node = self._new_node(keys[mid], values[mid], parent)
+        if depth != red_depth:
+            self._set_black(node)
+        self.left[node] = self._build(keys, values, lo, mid, depth + 1, red_depth, node)
+        self.right[node] = self._build(
+            keys, values, mid + 1, hi, depth + 1, red_depth, node
+        )
+        self.size[node] = hi - lo
+        return node
+
+    # Return the number of black nodes on a path from node i down to a leaf
+    def _black_height(self, i):
+        height = 0
+        while i:
+            height += not self._is_red(i)
+            i = self.left[i]
+        return height
+
+    # Return the number of bytes held by the array columns
+    def memory_usage(self):
+        columns = (self.key, self.value, self.left, self.right, self.parent, self.size)
+        return sum(c.itemsize * len(c) for c in columns) + len(self.colors)
+
+    # Return the number of nodes in the tree
+    def __len__(self):
+        return self.size[self.root]
@@ -0,0 +1,28 @@
+import re
+
+# An event ID tags a command line as "eventID: Command(...)"
+EVENT_TAG_RE = re.compile(r"[\w.-]+")
+
+
+# Split an event-tagged input into the command lines of each event. Returns
+# a dict of event ID -> list of lines, in order of first appearance. Blank
+# lines, comments and lines without a valid tag are skipped.
+def split_events(f_in):
+    events = {}
+    for line in f_in:
+        tag, sep, command = line.partition(":")
+        if not sep:
+            continue
+        tag = tag.strip()
+        if not EVENT_TAG_RE.fullmatch(tag):
+            continue
+        lines = events.get(tag)
+        if lines is None:
+            lines = events[tag] = []
+        lines.append(command.strip() + "\n")
+    return events
+
+
+# Return the output file name of one event of a tagged input file
+def event_output_filename(input_filename, event):
+    return f"{input_filename.split('.')[0]}_{event}_output_file.txt"
@@ -0,0 +1,93 @@
+from array import array
+
+# Pending assignment of a subtree (lazy tag)
+NO_TAG = 2
+
+
+# Class representing a segment tree over seat IDs 1..size that stores, for
+# every subtree, its longest run of free seats and the free runs touching
+# its two ends. A whole range of seats is freed or taken in O(log S) with
+# lazy tags, and the lowest block of n adjacent free seats is found in
+# O(log S) by descending towards the leftmost subtree that can hold it.
+class FreeRunTree:
+    def __init__(self, capacity):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.size = size  # Number of leaves (seats 1..size)
+        self.prefix = array("l", [0]) * (2 * size)  # Free run at the left end
+        self.suffix = array("l", [0]) * (2 * size)  # Free run at the right end
+        self.best = array("l", [0]) * (2 * size)  # Longest free run
+        self.tag = bytearray([NO_TAG]) * (2 * size)  # 1 = all free, 0 = all taken
+
+    # Return a tree of the given capacity holding the free runs (start, end)
+    @classmethod
+    def from_runs(cls, runs, capacity):
+        tree = cls(capacity)
+        for start, end in runs:
+            tree.assign(start, end, True)
+        return tree
+
+    # Mark the seats lo..hi (inclusive) free or taken. Seats outside 1..size
+    # are ignored.
+    def assign(self, lo, hi, free):
+        lo = max(lo, 1)
+        hi = min(hi, self.size)
+        if lo <= hi:
+            self._assign(1, 1, self.size, lo, hi, 1 if free else 0)
+
+    def _assign(self, node, node_lo, node_hi, lo, hi, free):
+        if lo <= node_lo and node_hi <= hi:
+            self._apply(node, node_hi - node_lo + 1, free)
+            return
+        self._push(node, node_hi - node_lo + 1)
+        mid = (node_lo + node_hi) // 2
+        if lo <= mid:
+            self._assign(2 * node, node_lo, mid, lo, hi, free)
+        if hi > mid:
+            self._assign(2 * node + 1, mid + 1, node_hi, lo, hi, free)
+        self._pull(node, mid - node_lo + 1)
+
+    # Return the first seat of the lowest block of count free adjacent seats,
+    # or None when there is no such block
+    def first_fit(self, count):
+        if self.best[1] < count:
+            return None
+        best, prefix, suffix = self.best, self.prefix, self.suffix
+        node, node_lo, length = 1, 1, self.size
+        while node < self.size:
+            self._push(node, length)
+            length >>= 1
+            left = 2 * node
+            if best[left] >= count:
+                node = left
+            elif suffix[left] + prefix[left + 1] >= count:
+                return node_lo + length - suffix[left]
+            else:
+                node = left + 1
+                node_lo += length
+        return node_lo
+
+    # Set every seat of a subtree of the given length free or taken
+    def _apply(self, node, length, free):
+        run = length if free else 0
+        self.prefix[node] = self.suffix[node] = self.best[node] = run
+        self.tag[node] = free
+
+    # Hand a pending assignment of node down to its children
+    def _push(self, node, length):
+        free = self.tag[node]
+        if free != NO_TAG:
+            self._apply(2 * node, length >> 1, free)
+            self._apply(2 * node + 1, length >> 1, free)
+            self.tag[node] = NO_TAG
+
+    # Recompute node from its children, each of the given length
+    def _pull(self, node, half):
+        left, right = 2 * node, 2 * node + 1
+        prefix, suffix, best = self.prefix, self.suffix, self.best
+        prefix[node] = prefix[left] if prefix[left] < half else half + prefix[right]
+        suffix[node] = (
+            suffix[right] if suffix[right] < half else half + suffix[left]
+        )
+        best[node] = max(best[left], best[right], suffix[left] + prefix[right])
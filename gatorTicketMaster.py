@@ -1,212 +1,791 @@
 import sys
 import os
 import time
-from seatheap import SeatHeap
-from minheap import MinHeap
-from rbtree import RedBlackTree
+import argparse
+import io
+import multiprocessing
+from itertools import islice
+from ticketengine import TicketEngine, WAITLISTS, STORES
+from ticketresults import Reserved, Held, BlockCancellation, CANCELED, WRONG_SEAT
+from ticketresults import ScenarioResult
+from commandparser import parse_commands, measure_parse, coalesce_commands
+from outputsink import BufferedSink, NullSink, BUFFER_BYTES
+from snapshot import save_snapshot, load_snapshot
+from writeaheadlog import WriteAheadLog, replay_log, OPCODES, GROUP_RECORDS, GROUP_MS
+from eventshards import split_events, event_output_filename
+from telemetry import Stats
+from whatif import run_forked, can_fork
+from changefeed import ChangeFeed, StreamFile, CapturingTicketEngine, ENCODERS
+from changefeed import RING_EVENTS
+
+
+# Parse the command line options
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="gatorTicketMaster")
+    parser.add_argument(
+        "input_files",
+        nargs="+",
+        metavar="input_file",
+        help="file with one command per line (several files run as one event each)",
+    )
+    parser.add_argument(
+        "--stats",
+        metavar="PATH",
+        help="write per-command latencies and structure counters to PATH as JSON",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=int,
+        default=0,
+        help="also rewrite the --stats file every N commands (0 = only at the end)",
+    )
+    parser.add_argument(
+        "--tagged",
+        action="store_true",
+        help='the input holds several events, one "eventID: Command(...)" per line',
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="worker processes for multiple events (default: one per core)",
+    )
+    parser.add_argument(
+        "--waitlist",
+        choices=sorted(WAITLISTS),
+        default="heap",
+        help=(
+            "waitlist implementation (bucket suits small integer priorities, "
+            "ostree answers WaitlistPosition in O(log n))"
+        ),
+    )
+    parser.add_argument(
+        "--store",
+        choices=sorted(STORES),
+        default="rbtree",
+        help=(
+            "reservation store (compact uses array columns, 64-bit IDs only; "
+            "persistent keeps immutable versions for concurrent readers)"
+        ),
+    )
+    parser.add_argument(
+        "--sink",
+        choices=["buffered", "null"],
+        default="buffered",
+        help="where output goes (null drops it, for benchmarks)",
+    )
+    parser.add_argument(
+        "--flush-bytes",
+        type=int,
+        default=BUFFER_BYTES,
+        help="size of the output buffer written as one block",
+    )
+    parser.add_argument(
+        "--flush-commands",
+        type=int,
+        default=0,
+        help="also flush the output after every N commands (0 = never)",
+    )
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="fsync the output file when the run ends",
+    )
+    parser.add_argument(
+        "--parse-only",
+        action="store_true",
+        help="only parse the input and print the parser throughput to stderr",
+    )
+    parser.add_argument(
+        "--memory-report",
+        action="store_true",
+        help="print the reservation store's bytes per reservation to stderr",
+    )
+    parser.add_argument(
+        "--restore",
+        metavar="PATH",
+        help="load the state from a snapshot before running the commands",
+    )
+    parser.add_argument(
+        "--snapshot",
+        metavar="PATH",
+        help="write a snapshot of the final state after running the commands",
+    )
+    parser.add_argument(
+        "--wal",
+        metavar="PATH",
+        help="append every mutating command to a write-ahead log before it runs",
+    )
+    parser.add_argument(
+        "--wal-group-records",
+        type=int,
+        default=GROUP_RECORDS,
+        help="fsync the write-ahead log once per N records",
+    )
+    parser.add_argument(
+        "--wal-group-ms",
+        type=float,
+        default=GROUP_MS,
+        help="or once its oldest unsynced record is this many milliseconds old",
+    )
+    parser.add_argument(
+        "--wal-compact",
+        type=int,
+        default=0,
+        help="fold the write-ahead log into a snapshot every N records (0 = never)",
+    )
+    parser.add_argument(
+        "--cdc",
+        metavar="PATH",
+        help="stream every change to seats and waitlists to PATH as typed events",
+    )
+    parser.add_argument(
+        "--cdc-format",
+        choices=sorted(ENCODERS),
+        default="ndjson",
+        help="encoding of the --cdc stream (one JSON object per line, or binary)",
+    )
+    parser.add_argument(
+        "--cdc-buffer",
+        type=int,
+        default=RING_EVENTS,
+        help="events held in memory before they are written to the --cdc stream",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="rebuild the state from a write-ahead log, rerunning its commands",
+    )
+    args = parser.parse_args(argv)
+    if len(args.input_files) > 1 or args.tagged:
+        single = (
+            "restore",
+            "snapshot",
+            "wal",
+            "replay",
+            "parse_only",
+            "memory_report",
+            "stats",
+            "cdc",
+        )
+        for option in single:
+            if getattr(args, option):
+                parser.error(f"--{option.replace('_', '-')} needs a single event")
+    return args
+
+
+# Rows of PrintReservations formatted and written per chunk
+PRINT_CHUNK = 4096
+
+
+# Write "Seat X, User Y" rows in chunks, keeping only one chunk in memory
+def write_reservations(f_out, pairs):
+    while True:
+        chunk = list(islice(pairs, PRINT_CHUNK))
+        if not chunk:
+            break
+        rows = [f"Seat {seatID}, User {userID}\n" for seatID, userID in chunk]
+        f_out.write("".join(rows))
+
+
+# Write the lines of waitlisted users promoted into seats, in one write
+def write_promotions(f_out, promoted):
+    if promoted:
+        f_out.write("".join(f"User {u} reserved seat {s}\n" for u, s in promoted))
+
+
+# Print the memory held by the reservation store
+def report_memory(store_name, reservations):
+    total = reservations.memory_usage()
+    per_reservation = total / len(reservations) if len(reservations) else 0
+    print(
+        f"Reservation store ({store_name}): {len(reservations)} reservations, "
+        f"{total} bytes, {per_reservation:.1f} bytes/reservation",
+        file=sys.stderr,
+    )
+
+
+# Print the memory held by the per-user index
+def report_user_memory(users):
+    total = users.memory_usage()
+    per_user = total / len(users) if len(users) else 0
+    mode = "dense" if users.rows is None else "hashed"
+    print(
+        f"User index ({mode}): {len(users)} users in {len(users.flags)} rows, "
+        f"{total} bytes, {per_user:.1f} bytes/user",
+        file=sys.stderr,
+    )
+
+
+# Command handlers. Each one applies a parsed command to the engine and
+# writes its output lines. args is a tuple of ints (ending with a section
+# name for commands that name one), or the exception raised while parsing a
+# malformed argument list.
+
+
+# Return the " in section name" suffix of seat messages
+def section_suffix(args):
+    return f" in section {args[1]}" if len(args) > 1 else ""
+
+
+def do_initialize(engine, f_out, args):
+    if type(args) is not tuple or not engine.valid_seat_count(args[0]):
+        f_out.write("Invalid input. Please provide a valid number of seats.\n")
+        return
+    seatCount = args[0]
+    engine.initialize(*args)
+    suffix = section_suffix(args)
+    f_out.write(f"{seatCount} Seats are made available for reservation{suffix}\n")
+
+
+def do_available(engine, f_out, args):
+    # Output the number of available seats and length of waitlist
+    seats, waiting = engine.available()
+    f_out.write(f"Total Seats Available : {seats}, Waitlist : {waiting}\n")
+    for name, seats, waiting in engine.section_availability():
+        f_out.write(
+            f"Section {name} : Seats Available : {seats}, Waitlist : {waiting}\n"
+        )
+
+
+def do_reserve(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    userID, userPriority = args[0], args[1]
+    section = args[2] if len(args) > 2 else None
+    if not engine.valid_users((userID,)):
+        f_out.write("Invalid input. Please provide a valid user ID.\n")
+        return
+    if section is not None and section not in engine.sections:
+        f_out.write(f"Section {section} does not exist\n")
+        return
+    result = engine.reserve(userID, userPriority, section)
+    if result is None:
+        return  # Already reserved or waitlisted: no output
+    elif isinstance(result, Reserved):
+        f_out.write(f"User {userID} reserved seat {result.seatID}\n")
+    elif section is not None:
+        f_out.write(
+            f"User {userID} is added to the waiting list of section {section}\n"
+        )
+    else:
+        f_out.write(f"User {userID} is added to the waiting list\n")
+
+
+def do_reserve_block(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    userID, count, userPriority = args
+    if not engine.valid_users((userID,)):
+        f_out.write("Invalid input. Please provide a valid user ID.\n")
+        return
+    if count < 1:
+        f_out.write("Invalid input. Please provide a valid number of seats.\n")
+        return
+    result = engine.reserve_block(userID, count, userPriority)
+    if result is None:
+        return  # Already reserved or waitlisted: no output
+    elif result.seatID is None:
+        f_out.write(
+            f"No block of {count} adjacent seats is available for User {userID}\n"
+        )
+    else:
+        last = result.seatID + count - 1
+        f_out.write(f"User {userID} reserved seats {result.seatID} to {last}\n")
+
+
+def do_hold(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    userID, userPriority, ttl = args
+    if not engine.valid_users((userID,)):
+        f_out.write("Invalid input. Please provide a valid user ID.\n")
+        return
+    if ttl < 1:
+        f_out.write("Invalid input. Please provide a valid hold time.\n")
+        return
+    result = engine.hold(userID, userPriority, ttl)
+    if result is None:
+        return  # Already reserved or waitlisted: no output
+    elif isinstance(result, Held):
+        f_out.write(
+            f"User {userID} holds seat {result.seatID} until {result.expires}\n"
+        )
+    else:
+        f_out.write(f"User {userID} is added to the waiting list\n")
+
+
+def do_confirm(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    userID = args[0]
+    result = engine.confirm(userID)
+    if result.seatID is None:
+        f_out.write(f"User {userID} has no hold to confirm\n")
+    else:
+        f_out.write(f"User {userID} confirmed seat {result.seatID}\n")
+
+
+def do_tick(engine, f_out, args):
+    if type(args) is not tuple or args[0] < 0:
+        f_out.write("Invalid input. Please provide a valid number of ticks.\n")
+        return
+    for expired in engine.tick(args[0]).expired:
+        f_out.write(
+            f"Hold of User {expired.userID} on seat {expired.seatID} expired\n"
+        )
+        if expired.promoted is not None:
+            write_promotions(f_out, [expired.promoted])
+
+
+def do_cancel(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    seatID, userID = args
+    result = engine.cancel(seatID, userID)
+    if type(result) is BlockCancellation:
+        f_out.write(f"User {userID} canceled their reservation\n")
+        write_promotions(f_out, result.promoted)
+    elif result.status == CANCELED:
+        f_out.write(f"User {userID} canceled their reservation\n")
+        if result.promoted is not None:
+            write_promotions(f_out, [result.promoted])
+    elif result.status == WRONG_SEAT:
+        f_out.write(f"User {userID} has no reservation for seat {seatID} to cancel\n")
+    else:
+        f_out.write(f"User {userID} has no reservation to cancel\n")
+
+
+def do_exit_waitlist(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    userID = args[0]
+    if engine.exit_waitlist(userID).removed:
+        f_out.write(f"User {userID} is removed from the waiting list\n")
+    else:
+        f_out.write(f"User {userID} is not in waitlist\n")
+
+
+def do_update_priority(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    userID, userPriority = args
+    if engine.update_priority(userID, userPriority).updated:
+        f_out.write(f"User {userID} priority has been updated to {userPriority}\n")
+    else:
+        f_out.write(f"User {userID} priority is not updated\n")
+
+
+def do_add_seats(engine, f_out, args):
+    if type(args) is not tuple or not engine.valid_seat_count(args[0]):
+        f_out.write("Invalid input. Please provide a valid number of seats.\n")
+        return
+    count = args[0]
+    result = engine.add_seats(*args)
+    suffix = section_suffix(args)
+    f_out.write(
+        f"Additional {count} Seats are made available for reservation{suffix}\n"
+    )
+    write_promotions(f_out, result.promoted)
+
+
+def do_waitlist_position(engine, f_out, args):
+    if type(args) is not tuple:
+        raise args
+    userID = args[0]
+    result = engine.waitlist_position(userID)
+    if result.position is None:
+        f_out.write(f"User {userID} is not in waitlist\n")
+        return
+    line = f"User {userID} is at position {result.position} in the waiting list"
+    if result.section is not None:
+        line += f" of section {result.section}"
+    f_out.write(line + "\n")
+
+
+def do_print_waitlist(engine, f_out, args):
+    if type(args) is not tuple or args[0] < 1:
+        f_out.write("Invalid input. Please provide a valid number of users.\n")
+        return
+    if len(args) > 1 and args[1] not in engine.sections:
+        f_out.write(f"Section {args[1]} does not exist\n")
+        return
+    for position, userID, priority in engine.waitlist_top(*args):
+        f_out.write(f"Position {position}, User {userID}, Priority {priority}\n")
+
+
+def do_print_reservations(engine, f_out, args):
+    if args and args[1] < args[0]:
+        f_out.write("Invalid input. Please provide a valid range of seats.\n")
+    elif not args:
+        write_reservations(f_out, engine.reservations())
+    else:
+        # Only the reservations for seats in [seatID1, seatID2]
+        write_reservations(f_out, engine.reservations(*args))
+
+
+def do_count_reserved(engine, f_out, args):
+    if type(args) is not tuple or args[1] < args[0]:
+        f_out.write("Invalid input. Please provide a valid range of seats.\n")
+        return
+    seatID1, seatID2 = args
+    count = engine.count_reserved(seatID1, seatID2)
+    f_out.write(f"Reserved Seats in the range [{seatID1}, {seatID2}] : {count}\n")
+
+
+def do_nth_reservation(engine, f_out, args):
+    if type(args) is not tuple:
+        f_out.write("Invalid input. Please provide a valid position.\n")
+        return
+    position = args[0]
+    entry = engine.nth_reservation(position)
+    if entry is None:
+        f_out.write(f"There is no reservation at position {position}\n")
+    else:
+        f_out.write(f"Seat {entry[0]}, User {entry[1]}\n")
+
+
+def do_release_seats(engine, f_out, args):
+    if isinstance(args, IndexError):
+        raise args
+    if type(args) is not tuple or args[1] < args[0]:
+        f_out.write("Invalid input. Please provide a valid range of users.\n")
+        return
+    userID1, userID2 = args
+    result = engine.release_seats(userID1, userID2)
+    f_out.write(
+        f"Reservations of the Users in the range [{userID1}, {userID2}] are released\n"
+    )
+    write_promotions(f_out, result.promoted)
+
+
+def do_snapshot(engine, f_out, args):
+    if type(args) is not tuple:
+        f_out.write("Invalid input. Please provide a valid file path.\n")
+        return
+    path = args[0]
+    try:
+        save_snapshot(engine, path)
+    except (OSError, OverflowError) as error:
+        f_out.write(f"Snapshot to {path} failed: {error}\n")
+        return
+    f_out.write(f"Snapshot written to {path}\n")
+
+
+def do_restore(engine, f_out, args):
+    if type(args) is not tuple:
+        f_out.write("Invalid input. Please provide a valid file path.\n")
+        return
+    path = args[0]
+    try:
+        load_snapshot(engine, path)
+    except (OSError, ValueError) as error:
+        f_out.write(f"Restore from {path} failed: {error}\n")
+        return
+    f_out.write(f"State restored from {path}\n")
+
+
+def do_simulate(engine, f_out, args):
+    if type(args) is not tuple:
+        f_out.write("Invalid input. Please provide a valid file path.\n")
+        return
+    if not can_fork():
+        f_out.write("Simulate is not supported on this platform\n")
+        return
+    for path, result in zip(args, simulate(engine, args)):
+        if isinstance(result, ScenarioResult):
+            f_out.write(
+                f"Scenario {path} : Seats Available : {result.seats}, "
+                f"Waitlist : {result.waitlist}, Reserved : {result.reserved}\n"
+            )
+        else:
+            f_out.write(f"Scenario {path} failed: {result}\n")
+
+
+# Command name -> handler
+HANDLERS = {
+    "Initialize": do_initialize,
+    "Available": do_available,
+    "Reserve": do_reserve,
+    "ReserveBlock": do_reserve_block,
+    "Hold": do_hold,
+    "Confirm": do_confirm,
+    "Tick": do_tick,
+    "Cancel": do_cancel,
+    "ExitWaitlist": do_exit_waitlist,
+    "UpdatePriority": do_update_priority,
+    "AddSeats": do_add_seats,
+    "WaitlistPosition": do_waitlist_position,
+    "PrintWaitlist": do_print_waitlist,
+    "PrintReservations": do_print_reservations,
+    "CountReserved": do_count_reserved,
+    "NthReservation": do_nth_reservation,
+    "ReleaseSeats": do_release_seats,
+    "Snapshot": do_snapshot,
+    "Restore": do_restore,
+    "Simulate": do_simulate,
+}
+
+
+# Batch handlers. Each one applies a run of consecutive commands of one type
+# whose arguments are well-formed, and writes the lines the plain handler
+# would have written for each command, in order. The work is done by a batch
+# renderer, which returns the text of each command on its own, so the server
+# can answer every request of a batch separately.
+
+
+# Return the text handler writes for one command
+def render(handler, engine, args):
+    out = io.StringIO()
+    handler(engine, out, args)
+    return out.getvalue()
+
+
+def reserve_batch_output(engine, batch):
+    if not engine.valid_users(userID for userID, _ in batch):
+        # Rejects the IDs the store cannot hold
+        return [render(do_reserve, engine, args) for args in batch]
+    texts = []
+    for result in engine.reserve_many(batch):
+        if result is None:
+            texts.append("")  # Already reserved or waitlisted: no output
+        elif isinstance(result, Reserved):
+            texts.append(f"User {result.userID} reserved seat {result.seatID}\n")
+        else:
+            texts.append(f"User {result.userID} is added to the waiting list\n")
+    return texts
+
+
+def update_priority_batch_output(engine, batch):
+    texts = []
+    for userID, userPriority, updated in engine.update_priorities(batch):
+        if updated:
+            texts.append(f"User {userID} priority has been updated to {userPriority}\n")
+        else:
+            texts.append(f"User {userID} priority is not updated\n")
+    return texts
+
+
+def do_reserve_batch(engine, f_out, batch):
+    f_out.write("".join(reserve_batch_output(engine, batch)))
+
+
+def do_update_priority_batch(engine, f_out, batch):
+    f_out.write("".join(update_priority_batch_output(engine, batch)))
+
+
+# Command name -> batch renderer, for the commands coalesced into batches
+BATCH_OUTPUTS = {
+    "Reserve": reserve_batch_output,
+    "UpdatePriority": update_priority_batch_output,
+}
+
+
+# Command name -> batch handler, for the commands coalesced into batches
+BATCH_HANDLERS = {
+    "Reserve": do_reserve_batch,
+    "UpdatePriority": do_update_priority_batch,
+}
+
+
+# Apply parsed commands to the engine until Quit or the end of input. With a
+# write-ahead log, every mutating command with well-formed arguments is logged
+# before it runs, and every --flush-commands flush commits the log first. The
+# sink's buffer still reaches the file on its own whenever it fills up, so
+# output may be on disk before the log records behind it are synced.
+# Runs of at least COALESCE_MIN consecutive commands that have a batch handler
+# are coalesced into one batch each, unless the output is flushed every few
+# commands.
+def run_commands(
+    engine, commands, sink, wal=None, handlers=HANDLERS, batch_handlers=BATCH_HANDLERS
+):
+    flush_commands = sink.flush_commands
+    if batch_handlers and not flush_commands:
+        commands = coalesce_commands(commands, batch_handlers)
+    pending = 0
+    for name, args in commands:
+        if type(args) is list:
+            if wal is not None:
+                for command_args in args:
+                    wal.append(name, command_args)
+            batch_handlers[name](engine, sink, args)
+            if wal is not None and wal.compaction_due():
+                wal.compact(engine)
+            continue
+        if name == "Quit":
+            sink.write("Program Terminated!!\n")
+            break
+        if wal is not None:
+            if name in OPCODES and type(args) is tuple:
+                wal.append(name, args)
+            handlers[name](engine, sink, args)
+            # Restore replaces the state the log starts from
+            if name == "Restore" or wal.compaction_due():
+                wal.compact(engine)
+        else:
+            handlers[name](engine, sink, args)
+        if flush_commands:
+            pending += 1
+            if pending == flush_commands:
+                if wal is not None:
+                    wal.commit()
+                sink.flush()
+                pending = 0
+
+
+# Run the commands of the scenario file path against engine, writing their
+# output to the scenario's own output file; return the end state
+def run_scenario(engine, path):
+    output_filename = path.split(".")[0] + "_output_file.txt"
+    if isinstance(engine, CapturingTicketEngine):
+        # The changes of a scenario are not part of the event's stream
+        engine.feed = ChangeFeed()
+    with open(path, "r") as f_in, BufferedSink(output_filename) as sink:
+        run_commands(engine, parse_commands(f_in), sink)
+    seats, waiting = engine.available()
+    return ScenarioResult(
+        path, seats, waiting, len(engine.reserved_seats), output_filename
+    )
+
+
+# Run every scenario file against its own copy-on-write fork of the engine,
+# up to jobs at a time (default: one per core), leaving the engine itself
+# untouched. Returns a ScenarioResult, or the exception that stopped the
+# scenario, per file.
+def simulate(engine, paths, jobs=None):
+    return run_forked(engine, paths, run_scenario, jobs)
+
+
+# Open the output sink selected on the command line
+def open_sink(args, output_filename):
+    if args.sink == "null":
+        return NullSink()
+    return BufferedSink(
+        output_filename,
+        buffer_bytes=args.flush_bytes,
+        flush_commands=args.flush_commands,
+        fsync=args.fsync,
+    )
+
+
+# Start a write-ahead log from the current state of the engine
+def open_wal(args, engine):
+    return WriteAheadLog(
+        args.wal,
+        engine,
+        group_records=args.wal_group_records,
+        group_ms=args.wal_group_ms,
+        compact_records=args.wal_compact,
+    )
+
+
+# Run the commands of one event in a fresh engine. source is an input file
+# name or the list of command lines of a tagged event.
+def run_event(job):
+    args, source, output_filename = job
+    engine = TicketEngine(waitlist=args.waitlist, store=args.store)
+    if isinstance(source, str):
+        f_in = open(source, "r")
+    else:
+        f_in = io.StringIO("".join(source))
+    with f_in, open_sink(args, output_filename) as sink:
+        run_commands(engine, parse_commands(f_in), sink)
+    return output_filename
+
+
+# Run every event in its own engine, spread over a pool of worker processes.
+# Each event writes its own output file, so the outputs do not depend on how
+# the events were scheduled.
+def run_events(args):
+    if args.tagged:
+        jobs = []
+        for input_filename in args.input_files:
+            with open(input_filename, "r") as f_in:
+                events = split_events(f_in)
+            for event, lines in events.items():
+                output_filename = event_output_filename(input_filename, event)
+                jobs.append((args, lines, output_filename))
+    else:
+        jobs = [
+            (args, name, name.split(".")[0] + "_output_file.txt")
+            for name in args.input_files
+        ]
+    if args.jobs <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            run_event(job)
+        return
+    with multiprocessing.Pool(min(args.jobs, len(jobs))) as pool:
+        for _ in pool.imap(run_event, jobs):
+            pass
+
 
 def main():
     if len(sys.argv) < 2:
         print("Input file not specified.")
         return
 
-    input_filename = sys.argv[1]
+    args = parse_args(sys.argv[1:])
+    if len(args.input_files) > 1 or args.tagged:
+        run_events(args)
+        return
+
+    input_filename = args.input_files[0]
     output_filename = input_filename.split(".")[0] + "_output_file.txt"
 
-    with open(input_filename, "r") as f_in, open(output_filename, "w") as f_out:
-        # Initialize data structures
-        seat_heap = SeatHeap()  # Heap to manage available seats
-        waitlist = MinHeap()  # Heap to manage the waitlist
-        reservations = RedBlackTree()  # Red-Black Tree to manage reservations
-        user_to_seat = {}  # Mapping from userID to seatID
-        next_seat_number = 1  # Next seat number to be assigned
-        timestamp = 0  # Timestamp to manage waitlist ordering
-        user_in_waitlist = {}  # Keep track of users in waitlist
-
-        for line in f_in:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith("#"):
-                continue
-            if line.startswith("Initialize("):
-                param = line[line.find("(") + 1 : line.find(")")]
-                try:
-                    seatCount = int(param)
-                    # Add seat numbers to the available seat heap
-                    for seatID in range(next_seat_number, next_seat_number + seatCount):
-                        seat_heap.push(seatID)
-                    next_seat_number += seatCount
-                    f_out.write(
-                        f"{seatCount} Seats are made available for reservation\n"
-                    )
-                except ValueError:
-                    f_out.write(
-                        "Invalid input. Please provide a valid number of seats.\n"
-                    )
-            elif line.startswith("Available"):
-                # Output the number of available seats and length of waitlist
-                f_out.write(
-                    f"Total Seats Available : {len(seat_heap.heap)}, Waitlist : {len(waitlist)}\n"
-                )
-            elif line.startswith("Reserve("):
-                params = line[line.find("(") + 1 : line.find(")")].split(",")
-                userID = int(params[0].strip())
-                userPriority = int(params[1].strip())
-                if userID in user_to_seat:
-                    # User already has a reservation
-                    continue  # As per instructions, users cannot reserve twice
-                elif userID in user_in_waitlist:
-                    # User already in waitlist
-                    continue  # Do nothing
-                else:
-                    if len(seat_heap) > 0:
-                        seatID = seat_heap.pop()
-                        reservations.insert(seatID, userID)
-                        user_to_seat[userID] = seatID
-                        f_out.write(f"User {userID} reserved seat {seatID}\n")
-                    else:
-                        timestamp += 1
-                        waitlist.push(userPriority, timestamp, userID)
-                        user_in_waitlist[userID] = True
-                        f_out.write(f"User {userID} is added to the waiting list\n")
-            elif line.startswith("Cancel("):
-                params = line[line.find("(") + 1 : line.find(")")].split(",")
-                seatID = int(params[0].strip())
-                userID = int(params[1].strip())
-                if userID in user_to_seat:
-                    if user_to_seat[userID] != seatID:
-                        f_out.write(
-                            f"User {userID} has no reservation for seat {seatID} to cancel\n"
-                        )
-                    else:
-                        # Cancel reservation
-                        reservations.delete_node(seatID)
-                        del user_to_seat[userID]
-                        if len(waitlist) > 0:
-                            next_user = waitlist.pop()
-                            seat_num = seatID
-                            reservations.insert(seat_num, next_user.userID)
-                            user_to_seat[next_user.userID] = seat_num
-                            del user_in_waitlist[next_user.userID]
-                            f_out.write(f"User {userID} canceled their reservation\n")
-                            f_out.write(
-                                f"User {next_user.userID} reserved seat {seat_num}\n"
-                            )
-                        else:
-                            seat_heap.push(seatID)
-                            f_out.write(f"User {userID} canceled their reservation\n")
-                else:
-                    f_out.write(f"User {userID} has no reservation to cancel\n")
-            elif line.startswith("ExitWaitlist("):
-                param = line[line.find("(") + 1 : line.find(")")]
-                userID = int(param.strip())
-                if userID in user_in_waitlist:
-                    waitlist.remove(userID)
-                    del user_in_waitlist[userID]
-                    f_out.write(f"User {userID} is removed from the waiting list\n")
-                else:
-                    f_out.write(f"User {userID} is not in waitlist\n")
-            elif line.startswith("UpdatePriority("):
-                params = line[line.find("(") + 1 : line.find(")")].split(",")
-                userID = int(params[0].strip())
-                userPriority = int(params[1].strip())
-                if userID in user_in_waitlist:
-                    waitlist.update_priority(userID, userPriority)
-                    f_out.write(
-                        f"User {userID} priority has been updated to {userPriority}\n"
-                    )
-                else:
-                    f_out.write(f"User {userID} priority is not updated\n")
-            elif line.startswith("AddSeats("):
-                param = line[line.find("(") + 1 : line.find(")")]
-                try:
-                    count = int(param)
-                    for seatID in range(next_seat_number, next_seat_number + count):
-                        seat_heap.push(seatID)
-                    next_seat_number += count
-                    if len(waitlist) == 0:
-                        f_out.write(
-                            f"Additional {count} Seats are made available for reservation\n"
-                        )
-                    else:
-                        f_out.write(
-                            f"Additional {count} Seats are made available for reservation\n"
-                        )
-                        while len(seat_heap) > 0 and len(waitlist) > 0:
-                            seatID = seat_heap.pop()
-                            next_user = waitlist.pop()
-                            reservations.insert(seatID, next_user.userID)
-                            user_to_seat[next_user.userID] = seatID
-                            del user_in_waitlist[next_user.userID]
-                            f_out.write(
-                                f"User {next_user.userID} reserved seat {seatID}\n"
-                            )
-                except ValueError:
-                    f_out.write(
-                        "Invalid input. Please provide a valid number of seats.\n"
-                    )
-            elif line.startswith("PrintReservations"):
-                res = reservations.inorder()
-                for seatID, userID in res:
-                    f_out.write(f"Seat {seatID}, User {userID}\n")
-            elif line.startswith("ReleaseSeats("):
-                params = line[line.find("(") + 1 : line.find(")")].split(",")
-                try:
-                    userID1 = int(params[0].strip())
-                    userID2 = int(params[1].strip())
-                    if userID2 < userID1:
-                        raise ValueError
-                    users_to_release = set(range(userID1, userID2 + 1))
-
-                    # First, remove users in the release range from the waitlist
-                    for userID in users_to_release:
-                        if userID in user_in_waitlist:
-                            waitlist.remove(userID)
-                            del user_in_waitlist[userID]
-
-                    assignment_messages = []
-                    for userID in users_to_release:
-                        if userID in user_to_seat:
-                            seatID = user_to_seat[userID]
-                            reservations.delete_node(seatID)
-                            del user_to_seat[userID]
-                            # Now assign the seat to next user not in the release range
-                            while len(waitlist) > 0:
-                                next_user = waitlist.pop()
-                                del user_in_waitlist[next_user.userID]
-                                if next_user.userID in users_to_release:
-                                    # Skip users in the release range
-                                    continue
-                                else:
-                                    reservations.insert(seatID, next_user.userID)
-                                    user_to_seat[next_user.userID] = seatID
-                                    assignment_messages.append(
-                                        f"User {next_user.userID} reserved seat {seatID}\n"
-                                    )
-                                    break  # Exit while loop for this seat
-                            else:
-                                seat_heap.push(seatID)
-                    if len(assignment_messages) == 0:
-                        f_out.write(
-                            f"Reservations of the Users in the range [{userID1}, {userID2}] are released\n"
-                        )
-                    else:
-                        f_out.write(
-                            f"Reservations of the Users in the range [{userID1}, {userID2}] are released\n"
-                        )
-                    for msg in assignment_messages:
-                        f_out.write(msg)
-                except ValueError:
-                    f_out.write(
-                        "Invalid input. Please provide a valid range of users.\n"
-                    )
-
-            elif line.startswith("Quit"):
-                f_out.write("Program Terminated!!\n")
-                break
-            else:
-                continue  # Ignore unrecognized commands
+    if args.parse_only:
+        with open(input_filename, "r") as f_in:
+            count, seconds = measure_parse(f_in)
+        rate = count / seconds if seconds else 0
+        print(
+            f"Parsed {count} commands in {seconds:.3f}s ({rate:.0f} commands/s)",
+            file=sys.stderr,
+        )
+        return
+
+    # All ticketing state lives in the engine; main only parses and formats
+    if args.cdc:
+        # Only an engine with a change stream pays for capturing changes
+        feed = ChangeFeed(max(1, args.cdc_buffer))
+        stream = StreamFile(args.cdc, ENCODERS[args.cdc_format])
+        feed.subscribe(stream)
+        engine = CapturingTicketEngine(feed, waitlist=args.waitlist, store=args.store)
+    else:
+        engine = TicketEngine(waitlist=args.waitlist, store=args.store)
+    handlers, batch_handlers = HANDLERS, BATCH_HANDLERS
+    if args.stats:
+        # Timed handlers and counting structures replace the plain ones, so
+        # a run without --stats executes none of the instrumentation. Every
+        # command is timed on its own, so none are coalesced.
+        stats = Stats(args.stats, args.stats_interval)
+        stats.instrument(engine)
+        handlers, batch_handlers = stats.timed_handlers(HANDLERS), None
+    if args.restore:
+        load_snapshot(engine, args.restore)
+
+    with open(input_filename, "r") as f_in, open_sink(args, output_filename) as sink:
+        if args.replay:
+            # The log's own commands run through the same handlers, so they
+            # write the same output lines again
+            commands = replay_log(engine, args.replay)
+            run_commands(engine, commands, sink, None, handlers, batch_handlers)
+        commands = parse_commands(f_in)
+        if args.wal:
+            with open_wal(args, engine) as wal:
+                run_commands(engine, commands, sink, wal, handlers, batch_handlers)
+        else:
+            run_commands(engine, commands, sink, None, handlers, batch_handlers)
+
+    if args.stats:
+        stats.export()
+    if args.cdc:
+        feed.close()
+        stream.close()
+
+    if args.snapshot:
+        save_snapshot(engine, args.snapshot)
+    if args.memory_report:
+        report_memory(args.store, engine.reserved_seats)
+        report_user_memory(engine.users)
 
 
 if __name__ == "__main__":
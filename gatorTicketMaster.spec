@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['rbnode,rbtree,minheapnode,minheap,seatheap'],
+    hiddenimports=['rbnode,rbtree,minheapnode,minheap,seatheap,seatpool,freeruntree,seatsection,timingwheel,userindex,bucketwaitlist,waitlistbucket,treewaitlist,compactrbtree,persistenttree,ticketengine,ticketresults,commandparser,outputsink,snapshot,writeaheadlog,eventshards,telemetry,whatif,changefeed'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,53 +1,102 @@
+import heapq
 from minheapnode import MinHeapNode
+from userindex import UserIndex, NO_SLOT
 
+# pop_many() sorts the heap once it takes at least 1 / SORT_FACTOR of it
+SORT_FACTOR = 8
 
-# Class representing the Min-Heap data structure (for waitlist)
+
+# Class representing the Min-Heap data structure (for waitlist). The index of
+# every user's node is kept in the slot column of a UserIndex, which an
+# engine shares between all its heaps and its own per-user state; each node
+# remembers its user's row, so moving nodes needs no lookup.
 class MinHeap:
-    def __init__(self):
+    def __init__(self, users=None):
         self.heap = []
-        self.user_map = {}  # Maps userID to index in the heap
+        self.users = UserIndex() if users is None else users
+        self.slot = self.users.slot  # Maps row to index in the heap
 
     # Add a new node to the heap
     def push(self, priority, timestamp, userID):
         node = MinHeapNode(
             -priority, timestamp, userID
         )  # Negative priority for max-heap behavior
+        node.row = self.users.row(userID)
         self.heap.append(node)
         idx = len(self.heap) - 1
-        self.user_map[userID] = idx
+        self.slot[node.row] = idx
         self._heapify_up(idx)
 
+    # Add a node for every (priority, timestamp, userID) entry. Adding a
+    # large share of the heap appends them all and heapifies once in O(n).
+    def push_many(self, entries):
+        if SORT_FACTOR * len(entries) < len(self.heap):
+            for priority, timestamp, userID in entries:
+                self.push(priority, timestamp, userID)
+            return
+        row, slot, heap = self.users.row, self.slot, self.heap
+        for priority, timestamp, userID in entries:
+            node = MinHeapNode(-priority, timestamp, userID)
+            node.row = row(userID)
+            slot[node.row] = len(heap)
+            heap.append(node)
+        for idx in range(len(heap) // 2 - 1, -1, -1):
+            self._heapify_down(idx)
+
     # Remove and return the node with highest priority (lowest value of negative priority)
     def pop(self):
         if not self.heap:
             return None
         root = self.heap[0]
-        del self.user_map[root.userID]
+        self.slot[root.row] = NO_SLOT
         last_node = self.heap.pop()
         if self.heap:
             self.heap[0] = last_node
-            self.user_map[last_node.userID] = 0
+            self.slot[last_node.row] = 0
             self._heapify_down(0)
+        self.users.release(root.userID, root.row)
         return root
 
+    # Remove and return the first k nodes in pop order. Taking a large share
+    # of the heap sorts it once instead of sifting after every pop; a sorted
+    # list is a valid heap, so the rest of it stays in place.
+    def pop_many(self, k):
+        k = min(k, len(self.heap))
+        if SORT_FACTOR * k < len(self.heap):
+            return [self.pop() for _ in range(k)]
+        self.heap.sort(key=lambda n: (n.priority, n.timestamp))
+        taken, self.heap = self.heap[:k], self.heap[k:]
+        for node in taken:
+            self.slot[node.row] = NO_SLOT
+            self.users.release(node.userID, node.row)
+        for idx, node in enumerate(self.heap):
+            self.slot[node.row] = idx
+        return taken
+
+    # Return the node with highest priority without removing it
+    def peek(self):
+        return self.heap[0] if self.heap else None
+
     # Remove a node with the given userID from the heap
     def remove(self, userID):
-        idx = self.user_map.get(userID)
-        if idx is None:
+        row = self.users.find(userID)
+        idx = self.slot[row] if row >= 0 else NO_SLOT
+        if idx == NO_SLOT:
             return False  # User not found in waitlist
-        del self.user_map[userID]
+        self.slot[row] = NO_SLOT
         last_node = self.heap.pop()
         if idx < len(self.heap):
             self.heap[idx] = last_node
-            self.user_map[last_node.userID] = idx
+            self.slot[last_node.row] = idx
             self._heapify_up(idx)
             self._heapify_down(idx)
+        self.users.release(userID, row)
         return True
 
     # Update the priority of a user in the heap
     def update_priority(self, userID, new_priority):
-        idx = self.user_map.get(userID)
-        if idx is None:
+        idx = self._index(userID)
+        if idx == NO_SLOT:
             return False  # User not found in waitlist
         node = self.heap[idx]
         node.priority = -new_priority  # Negative priority for max-heap behavior
@@ -55,6 +104,59 @@ class MinHeap:
         self._heapify_down(idx)
         return True
 
+    # Apply update_priority to every (userID, new_priority) pair in order and
+    # return whether each user was found. A batch touching a large share of
+    # the heap sets the priorities first and heapifies once in O(n).
+    def update_many(self, updates):
+        if SORT_FACTOR * len(updates) < len(self.heap):
+            return [self.update_priority(userID, p) for userID, p in updates]
+        found = []
+        for userID, new_priority in updates:
+            idx = self._index(userID)
+            if idx != NO_SLOT:
+                self.heap[idx].priority = -new_priority
+            found.append(idx != NO_SLOT)
+        for idx in range(len(self.heap) // 2 - 1, -1, -1):
+            self._heapify_down(idx)
+        return found
+
+    # Return the 1-based position of the user in pop order, or None when the
+    # user is not waiting. The heap keeps no order beyond its root, so this
+    # counts the nodes ahead of the user in O(n).
+    def position(self, userID):
+        idx = self._index(userID)
+        if idx == NO_SLOT:
+            return None
+        key = (self.heap[idx].priority, self.heap[idx].timestamp)
+        return 1 + sum((node.priority, node.timestamp) < key for node in self.heap)
+
+    # Return the first k nodes in pop order, in O(n log k)
+    def top(self, k):
+        return heapq.nsmallest(k, self.heap, key=lambda n: (n.priority, n.timestamp))
+
+    # Return the (priority, timestamp, userID) entries in heap order
+    def entries(self):
+        return [(-node.priority, node.timestamp, node.userID) for node in self.heap]
+
+    # Replace the heap with the given (priority, timestamp, userID) entries.
+    # Entries saved by entries() are already in heap order and keep their
+    # exact positions; any other order is heapified in O(n).
+    def load(self, entries):
+        for node in self.heap:
+            self.slot[node.row] = NO_SLOT
+            self.users.release(node.userID, node.row)
+        self.heap = [MinHeapNode(-p, t, userID) for p, t, userID in entries]
+        for idx, node in enumerate(self.heap):
+            node.row = self.users.row(node.userID)
+            self.slot[node.row] = idx
+        for idx in range(len(self.heap) // 2 - 1, -1, -1):
+            self._heapify_down(idx)
+
+    # Return the index of the user's node, or NO_SLOT when not in the heap
+    def _index(self, userID):
+        row = self.users.find(userID)
+        return self.slot[row] if row >= 0 else NO_SLOT
+
     # Move the node at index idx up to maintain heap property
     def _heapify_up(self, idx):
         while idx > 0 and (
@@ -99,7 +201,7 @@ class MinHeap:
 
     # Swap two nodes in the heap
     def _swap(self, i, j):
-        self.user_map[self.heap[i].userID], self.user_map[self.heap[j].userID] = j, i
+        self.slot[self.heap[i].row], self.slot[self.heap[j].row] = j, i
         self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
 
     # Return the number of nodes in the heap
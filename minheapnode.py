@@ -4,3 +4,4 @@ class MinHeapNode:
         self.priority = priority  # Store negative priority for max-heap behavior
         self.timestamp = timestamp  # Timestamp when the user was added to waitlist
         self.userID = userID  # User ID
+        self.row = -1  # Row of the user in the UserIndex of a MinHeap
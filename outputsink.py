@@ -0,0 +1,53 @@
+import os
+
+# Default size of the output buffer
+BUFFER_BYTES = 1 << 20
+
+
+# Class representing the output file of a run. Lines are accumulated in a
+# buffer of buffer_bytes and reach the file in blocks of that size; the
+# buffering itself happens inside the io module, so write() stays a C call.
+class BufferedSink:
+    def __init__(self, path, buffer_bytes=BUFFER_BYTES, flush_commands=0, fsync=False):
+        self.file = open(path, "w", buffering=buffer_bytes)
+        self.write = self.file.write
+        self.flush_commands = flush_commands  # Flush every N commands (0 = never)
+        self.fsync = fsync  # fsync the file when the run ends
+
+    # Push buffered lines to the operating system
+    def flush(self):
+        self.file.flush()
+
+    # Flush the remaining lines and close the file
+    def close(self):
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Class representing a sink that drops all output, for benchmark runs
+class NullSink:
+    flush_commands = 0
+
+    # Discard a line
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
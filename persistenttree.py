@@ -0,0 +1,403 @@
+import sys
+from rbnode import RedBlackNode
+from rbtree import BULK_FACTOR
+
+
+# Class representing an immutable node of a PersistentRedBlackTree. Empty
+# subtrees are None.
+class PersistentNode:
+    __slots__ = ("key", "value", "red", "left", "right", "size")
+
+    def __init__(self, key, value, red, left, right):
+        self.key = key  # Seat ID
+        self.value = value  # User ID
+        self.red = red  # True for red, False for black
+        self.left = left  # Left child
+        self.right = right  # Right child
+        # Number of nodes in the subtree rooted here
+        self.size = (left.size if left else 0) + (right.size if right else 0) + 1
+
+
+# Return True if node is red (empty subtrees are black)
+def _is_red(node):
+    return node is not None and node.red
+
+
+# Return a black copy of a red node, or the node itself when it is black
+def _blacken(node):
+    if node is None or not node.red:
+        return node
+    return PersistentNode(node.key, node.value, False, node.left, node.right)
+
+
+# Return a red copy of a black node
+def _redden(node):
+    return PersistentNode(node.key, node.value, True, node.left, node.right)
+
+
+# Return a subtree with the given key and children, removing a red node
+# with a red child from either side by rotating it up. The result is red
+# when it had to absorb a red-red pair, and black otherwise.
+def _balance(left, key, value, right):
+    if _is_red(left) and _is_red(right):
+        return PersistentNode(key, value, True, _blacken(left), _blacken(right))
+    if _is_red(left):
+        if _is_red(left.left):
+            return PersistentNode(
+                left.key,
+                left.value,
+                True,
+                _blacken(left.left),
+                PersistentNode(key, value, False, left.right, right),
+            )
+        if _is_red(left.right):
+            middle = left.right
+            return PersistentNode(
+                middle.key,
+                middle.value,
+                True,
+                PersistentNode(left.key, left.value, False, left.left, middle.left),
+                PersistentNode(key, value, False, middle.right, right),
+            )
+    if _is_red(right):
+        if _is_red(right.right):
+            return PersistentNode(
+                right.key,
+                right.value,
+                True,
+                PersistentNode(key, value, False, left, right.left),
+                _blacken(right.right),
+            )
+        if _is_red(right.left):
+            middle = right.left
+            return PersistentNode(
+                middle.key,
+                middle.value,
+                True,
+                PersistentNode(key, value, False, left, middle.left),
+                PersistentNode(
+                    right.key, right.value, False, middle.right, right.right
+                ),
+            )
+    return PersistentNode(key, value, False, left, right)
+
+
+# Return a copy of the subtree with key inserted along the search path, or
+# the subtree itself when it already holds key
+def _insert(node, key, value):
+    if node is None:
+        return PersistentNode(key, value, True, None, None)
+    if key < node.key:
+        left = _insert(node.left, key, value)
+        if left is node.left:
+            return node
+        if node.red:
+            return PersistentNode(node.key, node.value, True, left, node.right)
+        return _balance(left, node.key, node.value, node.right)
+    if key > node.key:
+        right = _insert(node.right, key, value)
+        if right is node.right:
+            return node
+        if node.red:
+            return PersistentNode(node.key, node.value, True, node.left, right)
+        return _balance(node.left, node.key, node.value, right)
+    return node  # Duplicate keys are not allowed
+
+
+# Return a copy of the subtree without key, which it holds. Deleting from a
+# black subtree lowers its black height by one; the callers make up for it.
+def _delete(node, key):
+    if key < node.key:
+        left = _delete(node.left, key)
+        if not _is_red(node.left):
+            return _fix_left(left, node.key, node.value, node.right)
+        return PersistentNode(node.key, node.value, True, left, node.right)
+    if key > node.key:
+        right = _delete(node.right, key)
+        if not _is_red(node.right):
+            return _fix_right(node.left, node.key, node.value, right)
+        return PersistentNode(node.key, node.value, True, node.left, right)
+    return _fuse(node.left, node.right)
+
+
+# Rebuild a node whose left subtree lost one level of black height
+def _fix_left(left, key, value, right):
+    if _is_red(left):
+        return PersistentNode(key, value, True, _blacken(left), right)
+    if not _is_red(right):
+        return _balance(left, key, value, _redden(right))
+    # The right child is red with a black left child
+    return PersistentNode(
+        right.left.key,
+        right.left.value,
+        True,
+        PersistentNode(key, value, False, left, right.left.left),
+        _balance(right.left.right, right.key, right.value, _redden(right.right)),
+    )
+
+
+# Rebuild a node whose right subtree lost one level of black height
+def _fix_right(left, key, value, right):
+    if _is_red(right):
+        return PersistentNode(key, value, True, left, _blacken(right))
+    if not _is_red(left):
+        return _balance(_redden(left), key, value, right)
+    # The left child is red with a black right child
+    return PersistentNode(
+        left.right.key,
+        left.right.value,
+        True,
+        _balance(_redden(left.left), left.key, left.value, left.right.left),
+        PersistentNode(key, value, False, left.right.right, right),
+    )
+
+
+# Join two subtrees of equal black height whose keys are all in order, in
+# place of the node that separated them
+def _fuse(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.red and right.red:
+        middle = _fuse(left.right, right.left)
+        if _is_red(middle):
+            return PersistentNode(
+                middle.key,
+                middle.value,
+                True,
+                PersistentNode(left.key, left.value, True, left.left, middle.left),
+                PersistentNode(
+                    right.key, right.value, True, middle.right, right.right
+                ),
+            )
+        return PersistentNode(
+            left.key,
+            left.value,
+            True,
+            left.left,
+            PersistentNode(right.key, right.value, True, middle, right.right),
+        )
+    if not left.red and not right.red:
+        middle = _fuse(left.right, right.left)
+        if _is_red(middle):
+            return PersistentNode(
+                middle.key,
+                middle.value,
+                True,
+                PersistentNode(left.key, left.value, False, left.left, middle.left),
+                PersistentNode(
+                    right.key, right.value, False, middle.right, right.right
+                ),
+            )
+        return _fix_left(
+            left.left,
+            left.key,
+            left.value,
+            PersistentNode(right.key, right.value, False, middle, right.right),
+        )
+    if right.red:
+        return PersistentNode(
+            right.key, right.value, True, _fuse(left, right.left), right.right
+        )
+    return PersistentNode(
+        left.key, left.value, True, left.left, _fuse(left.right, right)
+    )
+
+
+# Build a balanced subtree holding keys[lo:hi]: every level is black except
+# the last, partial one, which is red
+def _build(keys, values, lo, hi, depth, red_depth):
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    return PersistentNode(
+        keys[mid],
+        values[mid],
+        depth == red_depth,
+        _build(keys, values, lo, mid, depth + 1, red_depth),
+        _build(keys, values, mid + 1, hi, depth + 1, red_depth),
+    )
+
+
+# Class representing one version of a PersistentRedBlackTree. Its nodes
+# never change, so any number of threads can read a version without locks
+# while the tree moves on to newer versions. The nodes only this version
+# uses are freed once the last reference to it is dropped (or release() is
+# called).
+class TreeVersion:
+    def __init__(self, root=None, version=0):
+        self.root = root
+        self.version = version  # Number of changes that led to this version
+
+    # Drop the reference to the nodes of this version
+    def release(self):
+        self.root = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    # Return the node with the given key, or a black NULL node
+    def search(self, key):
+        node = self.root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return RedBlackNode(key=None, value=None, color="BLACK")
+        return RedBlackNode(node.key, node.value, "RED" if node.red else "BLACK")
+
+    # Lazily yield (key, value) pairs in key order, keeping an explicit stack
+    # of at most one root-to-leaf path instead of recursing
+    def iter_inorder(self):
+        stack = []
+        node = self.root
+        while True:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            yield node.key, node.value
+            node = node.right
+
+    # Inorder traversal of the tree
+    def inorder(self):
+        return list(self.iter_inorder())
+
+    # Lazily yield the (key, value) pairs with lo <= key <= hi in key order,
+    # visiting only the subtrees that overlap the range
+    def iter_range(self, lo, hi):
+        stack = []
+        node = self.root
+        while True:
+            while node is not None:
+                if node.key < lo:
+                    # The whole left subtree is below the range
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.key > hi:
+                return
+            yield node.key, node.value
+            node = node.right
+
+    # Return the (key, value) pairs with lo <= key <= hi in key order
+    def range_query(self, lo, hi):
+        return list(self.iter_range(lo, hi))
+
+    # Return the number of keys below key (or up to key when inclusive)
+    def rank(self, key, inclusive=False):
+        count = 0
+        node = self.root
+        while node is not None:
+            if key < node.key or (key == node.key and not inclusive):
+                node = node.left
+            else:
+                count += (node.left.size if node.left else 0) + 1
+                node = node.right
+        return count
+
+    # Return the number of keys with lo <= key <= hi
+    def count_range(self, lo, hi):
+        if hi < lo:
+            return 0
+        return self.rank(hi, inclusive=True) - self.rank(lo)
+
+    # Return the (key, value) pair with the k-th smallest key (1-based)
+    def select(self, k):
+        node = self.root
+        while node is not None:
+            left_size = node.left.size if node.left else 0
+            if k <= left_size:
+                node = node.left
+            elif k == left_size + 1:
+                return node.key, node.value
+            else:
+                k -= left_size + 1
+                node = node.right
+        return None
+
+    # Return the number of bytes held by the nodes and their keys and values
+    def memory_usage(self):
+        total = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is not None:
+                total += sys.getsizeof(node)
+                total += sys.getsizeof(node.key) + sys.getsizeof(node.value)
+                stack.append(node.left)
+                stack.append(node.right)
+        return total
+
+    # Return the number of nodes in the tree
+    def __len__(self):
+        return self.root.size if self.root else 0
+
+
+# Class representing a persistent Red-Black Tree with the API of
+# RedBlackTree. Nodes are immutable: an insert or delete copies the nodes
+# on the search path (and the few that rebalancing touches) and publishes
+# a new root, so each change costs O(log n) new nodes and leaves every
+# earlier version intact. pin() hands out the current version for readers.
+class PersistentRedBlackTree(TreeVersion):
+    # Return the current version; later changes to the tree do not show in it
+    def pin(self):
+        return TreeVersion(self.root, self.version)
+
+    # Insert a new node with the given key and value
+    def insert(self, key, value):
+        root = _insert(self.root, key, value)
+        if root is not self.root:
+            self._publish(_blacken(root))
+
+    # Delete the node with the given key
+    def delete_node(self, key):
+        node = self.root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return  # Key not found in tree
+        self._publish(_blacken(_delete(self.root, key)))
+
+    # Replace the tree with the given keys (sorted, unique) and their values,
+    # built directly as a balanced tree in O(n)
+    def load_sorted(self, keys, values):
+        red_depth = len(keys).bit_length() - 1
+        self._publish(_blacken(_build(keys, values, 0, len(keys), 0, red_depth)))
+
+    # Insert the given keys (sorted, unique, none of them in the tree) and
+    # their values. A run that is large next to the tree is merged with it
+    # and the tree rebuilt in O(n + k); anything else is inserted one key at
+    # a time.
+    def insert_many(self, keys, values):
+        if BULK_FACTOR * len(keys) >= len(self):
+            merged = sorted([*self.iter_inorder(), *zip(keys, values)])
+            self.load_sorted([k for k, _ in merged], [v for _, v in merged])
+        else:
+            for key, value in zip(keys, values):
+                self.insert(key, value)
+
+    # Delete the given keys (sorted, unique), rebuilding the tree from the
+    # remaining pairs when they are a large share of it
+    def delete_many(self, keys):
+        if BULK_FACTOR * len(keys) >= len(self) > 0:
+            gone = set(keys)
+            kept = [(k, v) for k, v in self.iter_inorder() if k not in gone]
+            self.load_sorted([k for k, _ in kept], [v for _, v in kept])
+        else:
+            for key in keys:
+                self.delete_node(key)
+
+    # Make root the current version
+    def _publish(self, root):
+        self.root = root
+        self.version += 1
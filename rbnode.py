@@ -1,5 +1,7 @@
 # Class representing a node in the Red-Black Tree
 class RedBlackNode:
+    __slots__ = ("key", "value", "color", "left", "right", "parent", "size")
+
     def __init__(self, key, value, color="RED", left=None, right=None, parent=None):
         self.key = key  # Seat ID
         self.value = value  # User ID
@@ -7,3 +9,4 @@ class RedBlackNode:
         self.left = left  # Left child
         self.right = right  # Right child
         self.parent = parent  # Parent node
+        self.size = 1  # Number of nodes in the subtree rooted here
@@ -1,10 +1,18 @@
+import heapq
+import sys
+from operator import itemgetter
 from rbnode import RedBlackNode
 
+# A batch of at least 1 / BULK_FACTOR of the tree's size rebuilds the tree
+# instead of updating it one key at a time
+BULK_FACTOR = 8
+
 
 # Class representing the Red-Black Tree data structure
 class RedBlackTree:
     def __init__(self):
         self.NULL_LEAF = RedBlackNode(key=None, value=None, color="BLACK")
+        self.NULL_LEAF.size = 0
         self.root = self.NULL_LEAF  # Initialize root as NULL_LEAF
 
     # Insert a new node with the given key and value
@@ -36,6 +44,10 @@ class RedBlackTree:
             parent.right = new_node
 
         new_node.color = "RED"  # New node must be red
+        # Every ancestor gained one node in its subtree
+        while parent is not None:
+            parent.size += 1
+            parent = parent.parent
         self.fix_insert(new_node)  # Fix the tree properties
 
     # Search for a node with the given key
@@ -70,6 +82,8 @@ class RedBlackTree:
 
         y = z
         y_original_color = y.color
+        if z.left == self.NULL_LEAF or z.right == self.NULL_LEAF:
+            self._shrink_ancestors(z)
         if z.left == self.NULL_LEAF:
             x = z.right
             self.rb_transplant(z, z.right)
@@ -80,6 +94,8 @@ class RedBlackTree:
             y = self.minimum(z.right)
             y_original_color = y.color
             x = y.right
+            # y leaves its position; z's count already includes the change
+            self._shrink_ancestors(y)
             if y.parent == z:
                 x.parent = y
             else:
@@ -90,10 +106,18 @@ class RedBlackTree:
             y.left = z.left
             y.left.parent = y
             y.color = z.color
+            y.size = z.size
 
         if y_original_color == "BLACK":
             self.fix_delete(x)
 
+    # Decrement the subtree size of every ancestor of node
+    def _shrink_ancestors(self, node):
+        node = node.parent
+        while node is not None:
+            node.size -= 1
+            node = node.parent
+
     # Find the minimum node starting from the given node
     def minimum(self, node):
         while node.left != self.NULL_LEAF:
@@ -110,9 +134,12 @@ class RedBlackTree:
             u.parent.right = v
         v.parent = u.parent
 
-    # Fix the red-black tree after insertion
+    # Fix the red-black tree after insertion; return the number of loop
+    # iterations it took (for telemetry)
     def fix_insert(self, k):
+        steps = 0
         while k.parent and k.parent.color == "RED":
+            steps += 1
             if k.parent == k.parent.parent.right:
                 u = k.parent.parent.left  # Uncle node
                 if u.color == "RED":
@@ -150,10 +177,14 @@ class RedBlackTree:
             if k == self.root:
                 break
         self.root.color = "BLACK"
+        return steps
 
-    # Fix the red-black tree after deletion
+    # Fix the red-black tree after deletion; return the number of loop
+    # iterations it took (for telemetry)
     def fix_delete(self, x):
+        steps = 0
         while x != self.root and x.color == "BLACK":
+            steps += 1
             if x == x.parent.left:
                 s = x.parent.right  # Sibling node
                 if s.color == "RED":
@@ -205,6 +236,7 @@ class RedBlackTree:
                     self.right_rotate(x.parent)
                     x = self.root
         x.color = "BLACK"
+        return steps
 
     # Left rotate the subtree rooted at x
     def left_rotate(self, x):
@@ -221,6 +253,8 @@ class RedBlackTree:
             x.parent.right = y
         y.left = x
         x.parent = y
+        y.size = x.size
+        x.size = x.left.size + x.right.size + 1
 
     # Right rotate the subtree rooted at x
     def right_rotate(self, x):
@@ -237,16 +271,213 @@ class RedBlackTree:
             x.parent.left = y
         y.right = x
         x.parent = y
+        y.size = x.size
+        x.size = x.left.size + x.right.size + 1
 
-    # Helper method for inorder traversal
-    def inorder_helper(self, node, result):
-        if node != self.NULL_LEAF:
-            self.inorder_helper(node.left, result)
-            result.append((node.key, node.value))
-            self.inorder_helper(node.right, result)
+    # Lazily yield (key, value) pairs in key order. The walk keeps an explicit
+    # stack of at most one root-to-leaf path instead of recursing.
+    def iter_inorder(self):
+        null = self.NULL_LEAF
+        stack = []
+        node = self.root
+        while True:
+            while node is not null:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            yield node.key, node.value
+            node = node.right
 
     # Inorder traversal of the tree
     def inorder(self):
-        result = []
-        self.inorder_helper(self.root, result)
-        return result
+        return list(self.iter_inorder())
+
+    # Lazily yield the (key, value) pairs with lo <= key <= hi in key order,
+    # visiting only the subtrees that overlap the range
+    def iter_range(self, lo, hi):
+        null = self.NULL_LEAF
+        stack = []
+        node = self.root
+        while True:
+            while node is not null:
+                if node.key < lo:
+                    # The whole left subtree is below the range
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.key > hi:
+                return
+            yield node.key, node.value
+            node = node.right
+
+    # Return the (key, value) pairs with lo <= key <= hi in key order
+    def range_query(self, lo, hi):
+        return list(self.iter_range(lo, hi))
+
+    # Return the number of keys below key (or up to key when inclusive)
+    def rank(self, key, inclusive=False):
+        count = 0
+        node = self.root
+        while node != self.NULL_LEAF:
+            if key < node.key or (key == node.key and not inclusive):
+                node = node.left
+            else:
+                count += node.left.size + 1
+                node = node.right
+        return count
+
+    # Return the number of keys with lo <= key <= hi
+    def count_range(self, lo, hi):
+        if hi < lo:
+            return 0
+        return self.rank(hi, inclusive=True) - self.rank(lo)
+
+    # Return the (key, value) pair with the k-th smallest key (1-based)
+    def select(self, k):
+        node = self.root
+        while node != self.NULL_LEAF:
+            left_size = node.left.size
+            if k <= left_size:
+                node = node.left
+            elif k == left_size + 1:
+                return node.key, node.value
+            else:
+                k -= left_size + 1
+                node = node.right
+        return None
+
+    # Replace the tree with the given keys (sorted, unique) and their values.
+    # The tree is built directly as a balanced tree in O(n): every level is
+    # black except the last, partial one, which is red.
+    def load_sorted(self, keys, values):
+        red_depth = len(keys).bit_length() - 1
+        self.root = self._build(keys, values, 0, len(keys), 0, red_depth, None)
+        self.root.color = "BLACK"
+
+    # Build the subtree holding keys[lo:hi] below parent
+    def _build(self, keys, values, lo, hi, depth, red_depth, parent):
+        if lo >= hi:
+            return self.NULL_LEAF
+        mid = (lo + hi) // 2
+        color = "RED" if depth == red_depth else "BLACK"
+        node = RedBlackNode(keys[mid], values[mid], color, parent=parent)
+        node.left = self._build(keys, values, lo, mid, depth + 1, red_depth, node)
+        node.right = self._build(keys, values, mid + 1, hi, depth + 1, red_depth, node)
+        node.size = hi - lo
+        return node
+
+    # Insert the given keys (sorted, unique, none of them in the tree) and
+    # their values. A run above every key of the tree is built as a balanced
+    # tree and joined on in O(k + log n); a run that is large next to the
+    # tree is merged with it and the tree rebuilt in O(n + k); anything else
+    # is inserted one key at a time.
+    def insert_many(self, keys, values):
+        if not keys:
+            return
+        if self.root == self.NULL_LEAF:
+            self.load_sorted(keys, values)
+        elif keys[0] > self._last().key:
+            self._join(keys, values)
+        elif BULK_FACTOR * len(keys) >= self.root.size:
+            merged = list(
+                heapq.merge(self.iter_inorder(), zip(keys, values), key=itemgetter(0))
+            )
+            self.load_sorted([k for k, _ in merged], [v for _, v in merged])
+        else:
+            for key, value in zip(keys, values):
+                self.insert(key, value)
+
+    # Delete the given keys (sorted, unique), rebuilding the tree from the
+    # remaining pairs when they are a large share of it
+    def delete_many(self, keys):
+        if BULK_FACTOR * len(keys) >= self.root.size > 0:
+            gone = set(keys)
+            kept = [(k, v) for k, v in self.iter_inorder() if k not in gone]
+            self.load_sorted([k for k, _ in kept], [v for _, v in kept])
+        else:
+            for key in keys:
+                self.delete_node(key)
+
+    # Return the node with the largest key (the tree is not empty)
+    def _last(self):
+        node = self.root
+        while node.right != self.NULL_LEAF:
+            node = node.right
+        return node
+
+    # Join the keys (sorted, all above the keys of the tree) onto the tree.
+    # keys[0] becomes a red pivot linking the tree with a balanced tree of
+    # the other keys, at the node of the taller tree's spine whose black
+    # height matches the shorter tree; fix_insert then repairs a red parent.
+    def _join(self, keys, values):
+        null = self.NULL_LEAF
+        red_depth = (len(keys) - 1).bit_length() - 1
+        right = self._build(keys, values, 1, len(keys), 0, red_depth, None)
+        right.color = "BLACK"
+        left = self.root
+        left_height = self._black_height(left)
+        right_height = self._black_height(right)
+        pivot = RedBlackNode(keys[0], values[0])
+        if left_height >= right_height:
+            # Walk down the right spine of the tree to the matching node
+            parent, node, height = None, left, left_height
+            while node.color == "RED" or height > right_height:
+                height -= node.color == "BLACK"
+                parent, node = node, node.right
+            pivot.left, pivot.right = node, right
+            if parent is None:
+                self.root = pivot
+            else:
+                parent.right = pivot
+            grown = right.size + 1
+        else:
+            # Walk down the left spine of the new keys to the matching node
+            parent, node, height = None, right, right_height
+            while node.color == "RED" or height > left_height:
+                height -= node.color == "BLACK"
+                parent, node = node, node.left
+            pivot.left, pivot.right = left, node
+            parent.left = pivot
+            self.root = right
+            grown = left.size + 1
+        pivot.size = pivot.left.size + pivot.right.size + 1
+        pivot.parent = parent
+        for child in (pivot.left, pivot.right):
+            if child != null:
+                child.parent = pivot
+        # Every ancestor of the pivot gained the other tree and the pivot
+        while parent is not None:
+            parent.size += grown
+            parent = parent.parent
+        self.fix_insert(pivot)
+
+    # Return the number of black nodes on a path from node down to a leaf
+    def _black_height(self, node):
+        height = 0
+        while node != self.NULL_LEAF:
+            height += node.color == "BLACK"
+            node = node.left
+        return height
+
+    # Return the number of bytes held by the nodes and their keys and values
+    def memory_usage(self):
+        total = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node != self.NULL_LEAF:
+                total += sys.getsizeof(node)
+                total += sys.getsizeof(node.key) + sys.getsizeof(node.value)
+                stack.append(node.left)
+                stack.append(node.right)
+        return total
+
+    # Return the number of nodes in the tree
+    def __len__(self):
+        return self.root.size
@@ -0,0 +1,136 @@
+import heapq
+from freeruntree import FreeRunTree
+
+
+# Class representing the pool of available seats as sorted disjoint runs
+# [start, end]. A block of seats costs one run instead of one heap entry per
+# seat, and a returned seat is merged back into its neighbouring runs.
+class SeatPool:
+    def __init__(self):
+        self.starts = []  # Min-heap of run starts (may hold stale entries)
+        self.run_end = {}  # Maps run start to run end
+        self.run_start = {}  # Maps run end to run start
+        self.size = 0  # Number of free seats across all runs
+        self.block_index = None  # FreeRunTree, built by the first take_block()
+
+    # Add the seats start..end (inclusive), none of which may be in the pool
+    # already: overlapping runs would corrupt the run maps
+    def add_range(self, start, end):
+        if end < start:
+            return
+        self.size += end - start + 1
+        # Merge with the run ending right before start
+        left_start = self.run_start.pop(start - 1, None)
+        if left_start is not None:
+            start = left_start
+        # Merge with the run starting right after end
+        right_end = self.run_end.pop(end + 1, None)
+        if right_end is not None:
+            del self.run_start[right_end]
+            end = right_end
+        if left_start is None:
+            heapq.heappush(self.starts, start)
+        self.run_end[start] = end
+        self.run_start[end] = start
+        if self.block_index is not None:
+            self._index_free(start, end)
+
+    # Add a single seat ID to the pool
+    def push(self, seatID):
+        self.add_range(seatID, seatID)
+
+    # Remove and return the seat ID with the lowest number
+    def pop(self):
+        if not self.size:
+            return None
+        start = self._lowest_start()
+        end = self.run_end.pop(start)
+        del self.run_start[end]
+        if start < end:
+            self.run_end[start + 1] = end
+            self.run_start[end] = start + 1
+            heapq.heapreplace(self.starts, start + 1)
+        else:
+            heapq.heappop(self.starts)
+        self.size -= 1
+        if self.block_index is not None:
+            self.block_index.assign(start, start, False)
+        return start
+
+    # Remove and return the count lowest seat IDs (all of them when the pool
+    # holds fewer), splitting whole runs off at a time
+    def pop_many(self, count):
+        seats = []
+        count = min(count, self.size)
+        while count > 0:
+            start = self._lowest_start()
+            end = self.run_end.pop(start)
+            del self.run_start[end]
+            last = min(end, start + count - 1)
+            if last < end:
+                self.run_end[last + 1] = end
+                self.run_start[end] = last + 1
+                heapq.heapreplace(self.starts, last + 1)
+            else:
+                heapq.heappop(self.starts)
+            seats.extend(range(start, last + 1))
+            count -= last - start + 1
+            self.size -= last - start + 1
+            if self.block_index is not None:
+                self.block_index.assign(start, last, False)
+        return seats
+
+    # Remove the lowest block of count adjacent free seats; return its first
+    # seat, or None when no run is that long. The first call builds the
+    # block index, so pools that never hand out blocks do not pay for it.
+    def take_block(self, count):
+        if self.block_index is None:
+            self.block_index = FreeRunTree.from_runs(self.runs(), self._capacity())
+        start = self.block_index.first_fit(count)
+        if start is None:
+            return None
+        # The lowest fitting block always starts a run, as runs are maximal
+        end = self.run_end.pop(start)
+        del self.run_start[end]
+        if start + count <= end:
+            self.run_end[start + count] = end
+            self.run_start[end] = start + count
+            heapq.heappush(self.starts, start + count)
+        self.size -= count
+        self.block_index.assign(start, start + count - 1, False)
+        return start
+
+    # Record the free seats start..end in the block index, growing it first
+    # when they lie beyond its last seat
+    def _index_free(self, start, end):
+        if end > self.block_index.size:
+            self.block_index = FreeRunTree.from_runs(self.runs(), 2 * end)
+        else:
+            self.block_index.assign(start, end, True)
+
+    # Return the highest free seat ID (at least 1)
+    def _capacity(self):
+        return max(self.run_start, default=1)
+
+    # Return the lowest run start, dropping stale heap entries on the way
+    def _lowest_start(self):
+        starts = self.starts
+        while starts[0] not in self.run_end:
+            heapq.heappop(starts)
+        return starts[0]
+
+    # Return the free runs as (start, end) pairs in ascending order
+    def runs(self):
+        return sorted(self.run_end.items())
+
+    # Replace the pool with the given disjoint runs, sorted by start
+    def load_runs(self, starts, ends):
+        self.starts = list(starts)  # A sorted list is already a heap
+        self.run_end = dict(zip(starts, ends))
+        self.run_start = dict(zip(ends, starts))
+        self.size = sum(ends) - sum(starts) + len(starts)
+        self.block_index = None
+
+    # Return the number of seats in the pool
+    def __len__(self):
+        return self.size
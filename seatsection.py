@@ -0,0 +1,10 @@
+# Class representing a section of the venue (and its price tier). A section
+# has its own pool of free seats and its own waitlist of users who asked for
+# a seat in it; its seat numbers come from the engine's global counter.
+class Section:
+    def __init__(self, name, ordinal, pool, waitlist):
+        self.name = name
+        self.ordinal = ordinal  # Position in declaration order
+        self.pool = pool  # SeatPool of the section's free seats
+        self.waitlist = waitlist  # Users waiting for a seat in this section
+        self.indexed = False  # Whether ordinal is in the engine's open index
@@ -0,0 +1,232 @@
+import gc
+import struct
+import sys
+from array import array
+from seatpool import SeatPool
+from seatsection import Section
+from timingwheel import TimingWheel
+from userindex import SEATED, WAITING
+
+# File header: magic, format version, next_seat_number, timestamp, logical
+# clock, and the number of free-seat runs, waitlist entries, reservations,
+# blocks, holds, named sections and seat ranges that follow
+HEADER = struct.Struct("<8sIqqqqqqqqqq")
+MAGIC = b"GTMSNAP\0"
+VERSION = 4
+
+# Header of a named section: length of its utf-8 name, and the number of its
+# free-seat runs and waitlist entries
+SECTION = struct.Struct("<Hqq")
+
+# Snapshots are little-endian whatever the machine
+SWAP = sys.byteorder == "big"
+
+
+# Write a column of 64-bit integers as one block
+def _write_column(f, values):
+    column = array("q", values)
+    if SWAP:
+        column.byteswap()
+    column.tofile(f)
+
+
+# Read a column of count 64-bit integers written by _write_column
+def _read_column(f, count):
+    column = array("q")
+    try:
+        column.fromfile(f, count)
+    except EOFError:
+        raise ValueError("truncated snapshot") from None
+    if SWAP:
+        column.byteswap()
+    return column
+
+
+# Write the state of the engine to path
+def save_snapshot(engine, path):
+    with open(path, "wb") as f:
+        write_snapshot(engine, f)
+
+
+# Replace the state of the engine with the snapshot at path
+def load_snapshot(engine, path):
+    with open(path, "rb") as f:
+        read_snapshot(engine, f)
+
+
+# Write the state of the engine to the binary file f. A snapshot is a header
+# and then one column per field: run starts and ends, waitlist priorities,
+# timestamps and userIDs, the reserved seats with their users in seat order,
+# the users holding blocks with their seat counts, the held users with their
+# expiry ticks in scheduling order, and the first seat and section ordinal of
+# every seat range. Each named section follows with its
+# own header, name, runs and waitlist columns.
+def write_snapshot(engine, f):
+    runs = engine.seat_pool.runs()
+    entries = engine.waitlist.entries()
+    reservations = list(engine.reserved_seats.iter_inorder())
+    blocks = list(engine.blocks.items())
+    holds = engine.holds.entries()
+    sections = engine.section_list[1:]
+    f.write(
+        HEADER.pack(
+            MAGIC,
+            VERSION,
+            engine.next_seat_number,
+            engine.timestamp,
+            engine.holds.now,
+            len(runs),
+            len(entries),
+            len(reservations),
+            len(blocks),
+            len(holds),
+            len(sections),
+            len(engine.range_starts),
+        )
+    )
+    for field in range(2):
+        _write_column(f, [run[field] for run in runs])
+    for field in range(3):
+        _write_column(f, [entry[field] for entry in entries])
+    for field in range(2):
+        _write_column(f, [pair[field] for pair in reservations])
+    for field in range(2):
+        _write_column(f, [block[field] for block in blocks])
+    for field in range(2):
+        _write_column(f, [hold[field] for hold in holds])
+    _write_column(f, engine.range_starts)
+    _write_column(f, [section.ordinal for section in engine.range_sections])
+    for section in sections:
+        name = section.name.encode()
+        runs = section.pool.runs()
+        entries = section.waitlist.entries()
+        f.write(SECTION.pack(len(name), len(runs), len(entries)))
+        f.write(name)
+        for field in range(2):
+            _write_column(f, [run[field] for run in runs])
+        for field in range(3):
+            _write_column(f, [entry[field] for entry in entries])
+
+
+# Replace the state of the engine with the snapshot read from the binary
+# file f. Every structure is rebuilt from its sorted columns in one pass;
+# nothing is inserted one element at a time.
+def read_snapshot(engine, f):
+    # Millions of new tree nodes would otherwise trigger many useless
+    # garbage collection passes
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        _read(engine, f)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# Record in the user index that userIDs wait in the waitlist of a section
+def _mark_waiting(index, userIDs, ordinal):
+    for userID in userIDs:
+        row = index.row(userID)
+        index.waitlist[row] = ordinal + 1
+        index.add(row, WAITING)
+
+
+# Read the columns of a snapshot from f and rebuild the engine from them.
+# The whole file is read and checked before the engine is touched, so a bad
+# snapshot leaves the engine as it was.
+def _read(engine, f):
+    header, columns, sections = _read_columns(f)
+    _apply(engine, header, columns, sections)
+
+
+# Read a whole snapshot from f. Returns the header fields, the columns of the
+# default section and the other state, and a (name, runs, entries) tuple of
+# columns for every named section. Raises ValueError for a bad file.
+def _read_columns(f):
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("truncated snapshot")
+    header = HEADER.unpack(header)
+    magic, version = header[:2]
+    runs, entries, reserved, blocks, holds, sections, ranges = header[5:]
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a snapshot file")
+    counts = (runs, runs, entries, entries, entries, reserved, reserved)
+    counts += (blocks, blocks, holds, holds, ranges, ranges)
+    columns = [_read_column(f, count) for count in counts]
+    named = []
+    for _ in range(sections):
+        section_header = f.read(SECTION.size)
+        if len(section_header) < SECTION.size:
+            raise ValueError("truncated snapshot")
+        name_length, runs, entries = SECTION.unpack(section_header)
+        name = f.read(name_length)
+        if len(name) < name_length:
+            raise ValueError("truncated snapshot")
+        counts = (runs, runs, entries, entries, entries)
+        section_columns = [_read_column(f, count) for count in counts]
+        named.append((name.decode(), *section_columns))
+    if any(not 0 <= ordinal <= sections for ordinal in columns[-1]):
+        raise ValueError("corrupt snapshot")
+    return header, columns, named
+
+
+# Replace the state of the engine with columns read by _read_columns()
+def _apply(engine, header, columns, sections):
+    next_seat, timestamp, clock = header[2:5]
+    starts, ends, priorities, timestamps, waiting = columns[:5]
+    seats, users, block_users, block_counts = columns[5:9]
+    hold_users, hold_expiries, range_starts, range_ordinals = columns[9:]
+
+    engine.next_seat_number = next_seat
+    engine.timestamp = timestamp
+    engine.seat_pool.load_runs(starts, ends)
+
+    # The waitlists are reloaded into an empty user index
+    for section in engine.section_list:
+        section.waitlist.load(())
+    engine.users.clear()
+    engine.waitlist.load(zip(priorities, timestamps, waiting))
+    _mark_waiting(engine.users, waiting, 0)
+    waiting = list(waiting)
+
+    # Rebuild the named sections and the index of sections with free seats
+    default = engine.section_list[0]
+    engine.sections = {default.name: default}
+    engine.section_list = [default]
+    engine.open_sections = []
+    default.indexed = False
+    for ordinal, section_columns in enumerate(sections, 1):
+        name, starts, ends, priorities, timestamps, section_waiting = section_columns
+        section = Section(name, ordinal, SeatPool(), engine._new_waitlist())
+        section.pool.load_runs(starts, ends)
+        section.waitlist.load(zip(priorities, timestamps, section_waiting))
+        _mark_waiting(engine.users, section_waiting, ordinal)
+        waiting.extend(section_waiting)
+        engine.sections[name] = section
+        engine.section_list.append(section)
+    for section in engine.section_list:
+        if len(section.pool) > 0:
+            engine._mark_open(section)
+    engine.range_starts = list(range_starts)
+    engine.range_sections = [engine.section_list[i] for i in range_ordinals]
+
+    waiting = array("q", sorted(waiting))
+    engine.waitlisted_users.load_sorted(waiting, array("q", [1]) * len(waiting))
+
+    engine.reserved_seats.load_sorted(seats, users)
+    # A block holder is mapped to the first seat of the block
+    user_to_seat = dict(zip(reversed(users), reversed(seats)))
+    for userID, seatID in user_to_seat.items():
+        row = engine.users.row(userID)
+        engine.users.seat[row] = seatID
+        engine.users.add(row, SEATED)
+    engine.blocks = dict(zip(block_users, block_counts))
+    engine.holds = TimingWheel(clock)
+    for userID, expires in zip(hold_users, hold_expiries):
+        engine.holds.schedule(userID, expires)
+    by_user = sorted(user_to_seat.items())
+    engine.reserved_users.load_sorted(
+        array("q", [pair[0] for pair in by_user]),
+        array("q", [pair[1] for pair in by_user]),
+    )
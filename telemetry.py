@@ -0,0 +1,139 @@
+import json
+import time
+from seatpool import SeatPool
+from minheap import MinHeap
+from rbtree import RedBlackTree
+
+# Latency histograms have one bucket per power of two nanoseconds
+HISTOGRAM_BUCKETS = 48
+
+
+# Class collecting per-command timings and the counters of the instrumented
+# structures of one engine. Nothing here runs unless --stats is given.
+class Stats:
+    def __init__(self, path=None, interval=0):
+        self.path = path  # JSON file written by export()
+        self.interval = interval  # Also export every N commands (0 = never)
+        self.commands = {}  # Maps command name to [count, total_ns, histogram]
+        self.seen = 0
+        self.structures = {}  # Maps structure name to its counters dict
+
+    # Return handlers that time every call before passing it to handlers
+    def timed_handlers(self, handlers):
+        return {name: self._timed(name, handler) for name, handler in handlers.items()}
+
+    def _timed(self, name, handler):
+        entry = self.commands[name] = [0, 0, [0] * HISTOGRAM_BUCKETS]
+        histogram = entry[2]
+        clock = time.perf_counter_ns
+
+        def timed(engine, f_out, args):
+            start = clock()
+            try:
+                handler(engine, f_out, args)
+            finally:
+                elapsed = clock() - start
+                entry[0] += 1
+                entry[1] += elapsed
+                histogram[min(elapsed.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+                self.seen += 1
+                if self.interval and self.seen % self.interval == 0:
+                    self.export()
+
+        return timed
+
+    # Replace the empty structures of the engine with counting subclasses
+    def instrument(self, engine):
+        default = engine.sections[""]
+        if type(engine.seat_pool) is SeatPool:
+            engine.seat_pool = default.pool = CountingSeatPool()
+            self.structures["seat_pool"] = engine.seat_pool.counts
+        if type(engine.waitlist) is MinHeap:
+            engine.waitlist = default.waitlist = CountingMinHeap(engine.users)
+            self.structures["waitlist"] = engine.waitlist.counts
+        for name in ("reserved_seats", "reserved_users", "waitlisted_users"):
+            if type(getattr(engine, name)) is RedBlackTree:
+                tree = CountingRedBlackTree()
+                setattr(engine, name, tree)
+                self.structures[name] = tree.counts
+
+    # Return the collected statistics as a JSON-ready dict
+    def summary(self):
+        commands = {}
+        for name, (count, total_ns, histogram) in self.commands.items():
+            if not count:
+                continue
+            commands[name] = {
+                "count": count,
+                "total_seconds": total_ns / 1e9,
+                "mean_ns": total_ns // count,
+                # Bound in ns -> calls shorter than it and at least half as long
+                "histogram_ns": {
+                    str(1 << bucket): calls
+                    for bucket, calls in enumerate(histogram)
+                    if calls
+                },
+            }
+        return {"commands": commands, "structures": self.structures}
+
+    # Write the summary to the stats file
+    def export(self):
+        with open(self.path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+# SeatPool counting run merges and stale heap entries dropped
+class CountingSeatPool(SeatPool):
+    def __init__(self):
+        super().__init__()
+        self.counts = {"merges": 0, "stale_starts": 0}
+
+    def add_range(self, start, end):
+        if end >= start:
+            self.counts["merges"] += (start - 1 in self.run_start) + (
+                end + 1 in self.run_end
+            )
+        super().add_range(start, end)
+
+    def _lowest_start(self):
+        before = len(self.starts)
+        start = super()._lowest_start()
+        self.counts["stale_starts"] += before - len(self.starts)
+        return start
+
+
+# MinHeap counting node swaps
+class CountingMinHeap(MinHeap):
+    def __init__(self, users=None):
+        super().__init__(users)
+        self.counts = {"swaps": 0}
+
+    def _swap(self, i, j):
+        self.counts["swaps"] += 1
+        super()._swap(i, j)
+
+
+# RedBlackTree counting rotations and fix-up loop iterations, as reported by
+# the fix-ups themselves
+class CountingRedBlackTree(RedBlackTree):
+    def __init__(self):
+        super().__init__()
+        self.counts = {"rotations": 0, "fix_insert_steps": 0, "fix_delete_steps": 0}
+
+    def left_rotate(self, x):
+        self.counts["rotations"] += 1
+        super().left_rotate(x)
+
+    def right_rotate(self, x):
+        self.counts["rotations"] += 1
+        super().right_rotate(x)
+
+    def fix_insert(self, k):
+        steps = super().fix_insert(k)
+        self.counts["fix_insert_steps"] += steps
+        return steps
+
+    def fix_delete(self, x):
+        steps = super().fix_delete(x)
+        self.counts["fix_delete_steps"] += steps
+        return steps
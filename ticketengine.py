@@ -0,0 +1,637 @@
+import heapq
+from bisect import bisect_right
+from seatpool import SeatPool
+from seatsection import Section
+from timingwheel import TimingWheel
+from userindex import UserIndex, SEATED, WAITING
+from minheap import MinHeap
+from bucketwaitlist import BucketWaitlist
+from treewaitlist import TreeWaitlist
+from rbtree import RedBlackTree
+from compactrbtree import CompactRedBlackTree
+from persistenttree import PersistentRedBlackTree
+from ticketresults import (
+    Reserved,
+    Held,
+    Confirmation,
+    ClockAdvanced,
+    BlockReserved,
+    Waitlisted,
+    Cancellation,
+    BlockCancellation,
+    SeatsAdded,
+    Release,
+    WaitlistExit,
+    PriorityUpdate,
+    QueuePosition,
+    WaitlistEntry,
+    Availability,
+    SectionAvailability,
+    CANCELED,
+    WRONG_SEAT,
+    NOT_RESERVED,
+)
+
+# Waitlist implementations selectable by name
+WAITLISTS = {
+    "heap": MinHeap,  # Binary heap on (priority, timestamp)
+    "bucket": BucketWaitlist,  # FIFO bucket per priority level
+    "ostree": TreeWaitlist,  # Order-statistic tree on (priority, timestamp)
+}
+
+# Reservation stores selectable by name
+STORES = {
+    "rbtree": RedBlackTree,  # One RedBlackNode object per entry
+    "compact": CompactRedBlackTree,  # Parallel array columns
+    "persistent": PersistentRedBlackTree,  # Immutable nodes, pinnable versions
+}
+
+# Ordered user indexes kept with each reservation store. Only reserved_seats
+# is ever pinned, so the persistent store keeps its user indexes in plain
+# trees instead of copying a search path on every change.
+INDEX_STORES = {
+    "rbtree": RedBlackTree,
+    "compact": CompactRedBlackTree,
+    "persistent": RedBlackTree,
+}
+
+# User IDs each store can hold, for the stores that cannot take every int
+USER_IDS = {"compact": range(-(1 << 63), 1 << 63)}
+
+# Highest seat number: the user index keeps seats in 64-bit columns
+MAX_SEAT = (1 << 63) - 1
+
+
+# Name of the section of seats added without a section name
+DEFAULT_SECTION = ""
+
+
+# Class holding the state of one event and applying ticketing operations to
+# it. Every operation returns a result object from ticketresults instead of
+# writing output, so the engine can be embedded or benchmarked on its own.
+#
+# Seats belong to sections. Seats added without a section name form the
+# default section, whose pool is seat_pool and whose waitlist is waitlist;
+# that waitlist also holds every user who asked for the best available seat,
+# so a seat freed in any section goes to the better of the two heads: the
+# section's own waitlist and the shared one.
+class TicketEngine:
+    def __init__(self, waitlist="heap", store="rbtree"):
+        self.waitlist_type = WAITLISTS[waitlist]
+        self.user_ids = USER_IDS.get(store)  # None when any int will do
+        self.users = UserIndex()  # Seat, waitlist and heap slot of every user
+        self.seat_pool = SeatPool()  # Runs of available seats
+        self.waitlist = self._new_waitlist()  # Waitlist ordered by priority
+        default = Section(DEFAULT_SECTION, 0, self.seat_pool, self.waitlist)
+        self.sections = {DEFAULT_SECTION: default}  # In declaration order
+        self.section_list = [default]  # Sections by ordinal
+        self.open_sections = []  # Heap of ordinals of sections with free seats
+        self.range_starts = []  # First seat of every range of opened seats
+        self.range_sections = []  # Section each of those ranges belongs to
+        self.reserved_seats = STORES[store]()  # Red-Black Tree of seatID -> userID
+        self.next_seat_number = 1  # Next seat number to be assigned
+        self.timestamp = 0  # Timestamp to manage waitlist ordering
+        self.reserved_users = INDEX_STORES[store]()  # Ordered index of userID -> seatID
+        self.waitlisted_users = INDEX_STORES[store]()  # Ordered waitlisted userIDs
+        self.blocks = {}  # Maps userID to the seat count of their block
+        self.holds = TimingWheel()  # Expiry tick of every held seat, by userID
+
+    # Make count new seats available without serving the waitlist. The
+    # section is declared by the first call that names it. Raises ValueError
+    # for a negative count or one that takes seat numbers past MAX_SEAT.
+    def initialize(self, count, section=DEFAULT_SECTION):
+        if not self.valid_seat_count(count):
+            raise ValueError("seat count out of range")
+        self._open_seats(count, self._declare(section))
+        return SeatsAdded(count, [])
+
+    # Make count new seats available and hand them to waitlisted users.
+    # Raises ValueError like initialize().
+    def add_seats(self, count, section=DEFAULT_SECTION):
+        if not self.valid_seat_count(count):
+            raise ValueError("seat count out of range")
+        section = self._declare(section)
+        self._open_seats(count, section)
+        nodes = self._pop_waiting(section, len(section.pool))
+        seats = section.pool.pop_many(len(nodes))
+        return SeatsAdded(count, self._promote_all(seats, nodes))
+
+    # Return True when count new seats can be opened
+    def valid_seat_count(self, count):
+        return 0 <= count and self.next_seat_number + count - 1 <= MAX_SEAT
+
+    # Return True when the reservation store can hold every one of userIDs
+    def valid_users(self, userIDs):
+        user_ids = self.user_ids
+        return user_ids is None or all(userID in user_ids for userID in userIDs)
+
+    # Return an empty waitlist. MinHeaps keep their slots in the engine's
+    # user index instead of a dict of their own.
+    def _new_waitlist(self):
+        if issubclass(self.waitlist_type, MinHeap):
+            return self.waitlist_type(self.users)
+        return self.waitlist_type()
+
+    # Return the section with the given name, declaring it if it is new
+    def _declare(self, name):
+        section = self.sections.get(name)
+        if section is None:
+            ordinal = len(self.section_list)
+            section = Section(name, ordinal, SeatPool(), self._new_waitlist())
+            self.sections[name] = section
+            self.section_list.append(section)
+        return section
+
+    # Add the next count (at least 0) seat numbers to the section's pool as
+    # one run. Seat numbers only grow, so every range starts above the last.
+    def _open_seats(self, count, section):
+        start = self.next_seat_number
+        section.pool.add_range(start, start + count - 1)
+        self.next_seat_number += count
+        if count > 0:
+            self.range_starts.append(start)
+            self.range_sections.append(section)
+            self._mark_open(section)
+
+    # Return the section seatID was opened in
+    def _section_of(self, seatID):
+        if len(self.section_list) == 1:
+            return self.section_list[0]
+        idx = bisect_right(self.range_starts, seatID) - 1
+        return self.range_sections[idx] if idx >= 0 else self.section_list[0]
+
+    # Record that the section has free seats
+    def _mark_open(self, section):
+        if not section.indexed:
+            heapq.heappush(self.open_sections, section.ordinal)
+            section.indexed = True
+
+    # Return the first section, in declaration order, with a free seat
+    def _best_section(self):
+        open_sections = self.open_sections
+        while open_sections:
+            section = self.section_list[open_sections[0]]
+            if len(section.pool) > 0:
+                return section
+            heapq.heappop(open_sections)  # Section ran out of seats
+            section.indexed = False
+        return None
+
+    # Return the waitlist whose head should get the next seat of the section,
+    # or None when nobody is waiting for it
+    def _next_waitlist(self, section):
+        shared = self.waitlist
+        own = section.waitlist
+        if own is shared or len(own) == 0:
+            return shared if len(shared) > 0 else None
+        if len(shared) == 0:
+            return own
+        own_head, shared_head = own.peek(), shared.peek()
+        if (own_head.priority, own_head.timestamp) < (
+            shared_head.priority,
+            shared_head.timestamp,
+        ):
+            return own
+        return shared
+
+    # Remove and return up to k waitlisted users, in the order seats of the
+    # section go to them. With a single waitlist to serve they come off it in
+    # one batch; otherwise each seat picks between the two heads.
+    def _pop_waiting(self, section, k):
+        own, shared = section.waitlist, self.waitlist
+        if own is shared or len(own) == 0:
+            return shared.pop_many(k)
+        if len(shared) == 0:
+            return own.pop_many(k)
+        nodes = []
+        while len(nodes) < k:
+            waitlist = self._next_waitlist(section)
+            if waitlist is None:
+                break
+            nodes.append(waitlist.pop())
+        return nodes
+
+    # Put a freed seat back into the pool of its section
+    def _free_seat(self, seatID, section):
+        section.pool.push(seatID)
+        self._mark_open(section)
+
+    # Return the number of free seats and the waitlist length
+    def available(self):
+        if len(self.section_list) == 1:
+            return Availability(len(self.seat_pool), len(self.waitlist))
+        seats = sum(len(section.pool) for section in self.section_list)
+        waiting = sum(len(section.waitlist) for section in self.section_list)
+        return Availability(seats, waiting)
+
+    # Return the free seats and waitlist length of every named section
+    def section_availability(self):
+        return [
+            SectionAvailability(section.name, len(section.pool), len(section.waitlist))
+            for section in self.section_list[1:]
+        ]
+
+    # Give the user the lowest free seat of the section, or of the first
+    # section with free seats when section is None; otherwise put them on the
+    # waitlist of the section (or the shared one). Returns None when the user
+    # already holds a seat or is waitlisted, raises KeyError for an unknown
+    # section and ValueError for a userID the store cannot hold.
+    def reserve(self, userID, priority, section=None):
+        if self.user_ids is not None and userID not in self.user_ids:
+            raise ValueError("user ID out of range")
+        row = self.users.find(userID)
+        if row >= 0 and self.users.flags[row]:
+            return None  # Users cannot reserve twice
+        if section is None:
+            target = self._best_section()
+            queue = self.section_list[0]  # The shared waitlist
+        else:
+            target = queue = self.sections[section]
+        if target is not None and len(target.pool) > 0:
+            seatID = target.pool.pop()
+            self._assign(seatID, userID)
+            return Reserved(userID, seatID)
+        self._wait(userID, priority, queue)
+        return Waitlisted(userID)
+
+    # Apply reserve(userID, priority) to every (userID, priority) request in
+    # order and return the results the calls would have returned one by one.
+    # While only the default section exists, the users new to the event take
+    # the lowest free seats as one range, which goes into the trees in one
+    # bulk insert, and the rest join the waitlist in request order. Raises
+    # ValueError before any change when the store cannot hold a userID.
+    def reserve_many(self, requests):
+        if not self.valid_users(userID for userID, _ in requests):
+            raise ValueError("user ID out of range")
+        if len(self.section_list) > 1:
+            return [self.reserve(userID, priority) for userID, priority in requests]
+        users = self.users
+        seen = set()
+        fresh = []  # Requests of users with no seat or place in line yet
+        for i, (userID, _) in enumerate(requests):
+            row = users.find(userID)
+            if userID not in seen and (row < 0 or not users.flags[row]):
+                seen.add(userID)
+                fresh.append(i)
+        results = [None] * len(requests)
+        seats = self.seat_pool.pop_many(len(fresh))
+        seated = [requests[i][0] for i in fresh[: len(seats)]]
+        for i, userID, seatID in zip(fresh, seated, seats):
+            row = users.row(userID)
+            users.seat[row] = seatID
+            users.flags[row] = SEATED
+            results[i] = Reserved(userID, seatID)
+        self.reserved_seats.insert_many(seats, seated)
+        by_user = sorted(zip(seated, seats))
+        self.reserved_users.insert_many(
+            [userID for userID, _ in by_user], [seatID for _, seatID in by_user]
+        )
+        # The rest join the shared waitlist in request order
+        entries = []
+        for i in fresh[len(seats) :]:
+            userID, priority = requests[i]
+            self.timestamp += 1
+            entries.append((priority, self.timestamp, userID))
+            results[i] = Waitlisted(userID)
+        self.waitlist.push_many(entries)
+        for _, _, userID in entries:
+            row = users.row(userID)
+            users.waitlist[row] = 1  # Ordinal + 1 of the default section
+            users.flags[row] = WAITING
+        users.count += len(fresh)
+        waiting = sorted(userID for _, _, userID in entries)
+        self.waitlisted_users.insert_many(waiting, [1] * len(waiting))
+        return results
+
+    # Reserve a seat like reserve() does, but only until the logical clock
+    # reaches now + ttl; the hold then expires unless confirmed. A user put
+    # on the waitlist gets a plain reservation when promoted.
+    def hold(self, userID, priority, ttl):
+        result = self.reserve(userID, priority)
+        if type(result) is not Reserved:
+            return result
+        expires = self.holds.now + ttl
+        self.holds.schedule(userID, expires)
+        return Held(userID, result.seatID, expires)
+
+    # Turn the user's hold into a plain reservation
+    def confirm(self, userID):
+        if not self.holds.cancel(userID):
+            return Confirmation(userID, None)
+        return Confirmation(userID, self.users.seat_of(userID))
+
+    # Move the logical clock forward by ticks and cancel the holds that
+    # expired, in order of expiry. Each freed seat goes through cancel(), so
+    # it is handed to the waitlist exactly as a canceled seat would be.
+    def tick(self, ticks):
+        expired = [
+            self.cancel(self.users.seat_of(userID), userID)
+            for userID in self.holds.advance(self.holds.now + ticks)
+        ]
+        return ClockAdvanced(self.holds.now, expired)
+
+    # Give the user the lowest block of count adjacent free seats, taken from
+    # the first section (in declaration order) that has one. Block requests
+    # are not waitlisted: a freed seat could never satisfy them.
+    # Returns None when the user already holds a seat or is waitlisted, and
+    # raises ValueError for a userID the store cannot hold.
+    def reserve_block(self, userID, count, priority):
+        if self.user_ids is not None and userID not in self.user_ids:
+            raise ValueError("user ID out of range")
+        row = self.users.find(userID)
+        if row >= 0 and self.users.flags[row]:
+            return None  # Users cannot reserve twice
+        for section in self.section_list:
+            if len(section.pool) >= count:
+                seatID = section.pool.take_block(count)
+                if seatID is not None:
+                    self._assign_block(seatID, userID, count)
+                    return BlockReserved(userID, seatID, count)
+        return BlockReserved(userID, None, count)
+
+    # Cancel the user's reservation of seatID and pass the seat on. For a
+    # block, seatID may be any of its seats and the whole block is returned.
+    def cancel(self, seatID, userID):
+        users = self.users
+        row = users.find(userID)
+        if row < 0 or not users.flags[row] & SEATED:
+            return Cancellation(seatID, userID, NOT_RESERVED, None)
+        current = users.seat[row]
+        count = self.blocks.get(userID)
+        if count is not None and current <= seatID < current + count:
+            return self._cancel_block(seatID, userID)
+        if current != seatID:
+            return Cancellation(seatID, userID, WRONG_SEAT, None)
+        self._unassign(seatID, userID)
+        section = self._section_of(seatID)
+        waitlist = self._next_waitlist(section)
+        if waitlist is not None:
+            promoted = self._promote(seatID, waitlist)
+            return Cancellation(seatID, userID, CANCELED, promoted)
+        self._free_seat(seatID, section)
+        self._shrink_users()
+        return Cancellation(seatID, userID, CANCELED, None)
+
+    # Remove the user from the waitlist
+    def exit_waitlist(self, userID):
+        waitlist = self._waitlist_of(userID)
+        if waitlist is None:
+            return WaitlistExit(userID, False)
+        waitlist.remove(userID)
+        self._leave_waitlist(userID)
+        self._shrink_users()
+        return WaitlistExit(userID, True)
+
+    # Change the priority of a waitlisted user
+    def update_priority(self, userID, priority):
+        waitlist = self._waitlist_of(userID)
+        if waitlist is None:
+            return PriorityUpdate(userID, priority, False)
+        waitlist.update_priority(userID, priority)
+        return PriorityUpdate(userID, priority, True)
+
+    # Apply update_priority(userID, priority) to every (userID, priority)
+    # update in order and return the results. While only the default section
+    # exists, every waitlisted user is in the shared waitlist, which takes
+    # the whole batch at once.
+    def update_priorities(self, updates):
+        if len(self.section_list) > 1:
+            return [self.update_priority(userID, p) for userID, p in updates]
+        found = self.waitlist.update_many(updates)
+        return [
+            PriorityUpdate(userID, priority, updated)
+            for (userID, priority), updated in zip(updates, found)
+        ]
+
+    # Drop the reservations and waitlist entries of users in [userID1, userID2]
+    # and hand the freed seats to the remaining waitlisted users
+    def release_seats(self, userID1, userID2):
+        if userID2 < userID1:
+            raise ValueError("empty user range")
+        # First, remove users in the release range from the waitlist.
+        # The ordered indexes only yield users that fall in the range.
+        for userID, _ in self.waitlisted_users.range_query(userID1, userID2):
+            self._waitlist_of(userID).remove(userID)
+            self._leave_waitlist(userID)
+
+        freed = []
+        for userID, seatID in self.reserved_users.range_query(userID1, userID2):
+            count = self.blocks.get(userID)
+            if count is None:
+                self._unassign(seatID, userID)
+                freed.append(seatID)
+            else:
+                self._unassign_block(seatID, userID, count)
+                freed.extend(range(seatID, seatID + count))
+
+        # Then hand the freed seats, in that order, to the remaining
+        # waitlisted users; nobody left in the waitlists is in the range
+        if len(self.section_list) == 1:
+            section = self.section_list[0]
+            nodes = self.waitlist.pop_many(len(freed))
+            seats = freed[: len(nodes)]
+            for seatID in freed[len(nodes) :]:
+                self._free_seat(seatID, section)
+        else:
+            seats, nodes = [], []
+            for seatID in freed:
+                section = self._section_of(seatID)
+                waitlist = self._next_waitlist(section)
+                if waitlist is None:
+                    self._free_seat(seatID, section)
+                else:
+                    seats.append(seatID)
+                    nodes.append(waitlist.pop())
+        result = Release(userID1, userID2, self._promote_all(seats, nodes))
+        self._shrink_users()
+        return result
+
+    # Shrink the user index once most of its rows are free, and move the
+    # MinHeap nodes to their users' new rows
+    def _shrink_users(self):
+        moved = self.users.shrink()
+        if moved is None:
+            return
+        for section in self.section_list:
+            if isinstance(section.waitlist, MinHeap):
+                for node in section.waitlist.heap:
+                    node.row = moved[node.row]
+
+    # Return the position of the user in the waitlist they are in
+    def waitlist_position(self, userID):
+        section = self._section_waited_for(userID)
+        if section is None:
+            return QueuePosition(userID, None, None)
+        name = section.name if section.ordinal else None
+        return QueuePosition(userID, section.waitlist.position(userID), name)
+
+    # Return the first k users of the shared waitlist, or of the waitlist of
+    # the named section. Raises KeyError for an unknown section.
+    def waitlist_top(self, k, section=DEFAULT_SECTION):
+        waitlist = self.sections[section].waitlist
+        return [
+            WaitlistEntry(position, node.userID, -node.priority)
+            for position, node in enumerate(waitlist.top(k), 1)
+        ]
+
+    # Return the seat of the user (the first seat of a block), or None
+    def seat_of(self, userID):
+        return self.users.seat_of(userID)
+
+    # Return the section whose waitlist holds the user, or None
+    def _section_waited_for(self, userID):
+        users = self.users
+        row = users.find(userID)
+        if row < 0 or not users.flags[row] & WAITING:
+            return None
+        return self.section_list[users.waitlist[row] - 1]
+
+    # Return the waitlist holding the user, or None
+    def _waitlist_of(self, userID):
+        section = self._section_waited_for(userID)
+        return None if section is None else section.waitlist
+
+    # Return an iterator of (seatID, userID) pairs in seat order, optionally
+    # limited to seats in [seatID1, seatID2]
+    def reservations(self, seatID1=None, seatID2=None):
+        if seatID1 is None:
+            return self.reserved_seats.iter_inorder()
+        return self.reserved_seats.iter_range(seatID1, seatID2)
+
+    # Return the number of reserved seats in [seatID1, seatID2]
+    def count_reserved(self, seatID1, seatID2):
+        return self.reserved_seats.count_range(seatID1, seatID2)
+
+    # Return the (seatID, userID) pair with the k-th lowest seat, or None
+    def nth_reservation(self, k):
+        return self.reserved_seats.select(k)
+
+    # Return the reservation queries over the reservations as they are now,
+    # which later commands leave untouched. Only the persistent store can
+    # be pinned; other stores raise AttributeError.
+    def pin_reservations(self):
+        return PinnedReservations(self.reserved_seats.pin())
+
+    # Give seatID to the next user of the waitlist, who moves from waiting
+    # to seated in place
+    def _promote(self, seatID, waitlist):
+        userID = waitlist.pop().userID
+        users = self.users
+        row = users.find(userID)
+        users.seat[row] = seatID
+        users.flags[row] = users.flags[row] & ~WAITING | SEATED
+        self.waitlisted_users.delete_node(userID)
+        self.reserved_seats.insert(seatID, userID)
+        self.reserved_users.insert(userID, seatID)
+        return Reserved(userID, seatID)
+
+    # Give seats[i] to the user of the waitlist node nodes[i], for every
+    # node. The users move from waiting to seated in place, and each ordered
+    # index takes the batch as one sorted run.
+    def _promote_all(self, seats, nodes):
+        users = self.users
+        userIDs = [node.userID for node in nodes]
+        for seatID, userID in zip(seats, userIDs):
+            row = users.find(userID)
+            users.seat[row] = seatID
+            users.flags[row] = users.flags[row] & ~WAITING | SEATED
+        self.waitlisted_users.delete_many(sorted(userIDs))
+        by_seat = sorted(zip(seats, userIDs))
+        self.reserved_seats.insert_many(
+            [seatID for seatID, _ in by_seat], [userID for _, userID in by_seat]
+        )
+        by_user = sorted(zip(userIDs, seats))
+        self.reserved_users.insert_many(
+            [userID for userID, _ in by_user], [seatID for _, seatID in by_user]
+        )
+        return [Reserved(userID, seatID) for seatID, userID in zip(seats, userIDs)]
+
+    # Cancel the whole block of userID: its lowest seats go to waitlisted
+    # users and the rest back to the pool as one run
+    def _cancel_block(self, seatID, userID):
+        start = self.users.seat_of(userID)
+        count = self.blocks[userID]
+        self._unassign_block(start, userID, count)
+        end = start + count - 1
+        # A block lies in a single run of one section's pool
+        section = self._section_of(start)
+        nodes = self._pop_waiting(section, count)
+        promoted = self._promote_all(range(start, start + len(nodes)), nodes)
+        free = start + len(nodes)
+        if free <= end:
+            section.pool.add_range(free, end)
+            self._mark_open(section)
+        return BlockCancellation(seatID, userID, count, promoted)
+
+    # Record that userID holds the count seats from start on. The seats go
+    # into reserved_seats as one sorted run.
+    def _assign_block(self, start, userID, count):
+        self.reserved_seats.insert_many(range(start, start + count), [userID] * count)
+        self._seat_user(userID, start)
+        self.reserved_users.insert(userID, start)
+        self.blocks[userID] = count
+
+    # Forget that userID holds the count seats from start on
+    def _unassign_block(self, start, userID, count):
+        self.reserved_seats.delete_many(range(start, start + count))
+        self._unseat_user(userID)
+        self.reserved_users.delete_node(userID)
+        del self.blocks[userID]
+
+    # Record that userID holds seatID
+    def _assign(self, seatID, userID):
+        self.reserved_seats.insert(seatID, userID)
+        self._seat_user(userID, seatID)
+        self.reserved_users.insert(userID, seatID)
+
+    # Forget that userID holds seatID
+    def _unassign(self, seatID, userID):
+        self.reserved_seats.delete_node(seatID)
+        self._unseat_user(userID)
+        self.reserved_users.delete_node(userID)
+        self.holds.cancel(userID)  # A canceled or released hold never expires
+
+    # Record seatID (the first seat of a block) as the user's seat
+    def _seat_user(self, userID, seatID):
+        users = self.users
+        row = users.row(userID)
+        users.seat[row] = seatID
+        if not users.flags[row]:
+            users.count += 1
+        users.flags[row] |= SEATED
+
+    # Forget the seat of the user
+    def _unseat_user(self, userID):
+        users = self.users
+        users.discard(userID, users.find(userID), SEATED)
+
+    # Put the user at the end of the line of their priority in the waitlist
+    # of queue, a Section
+    def _wait(self, userID, priority, queue):
+        self.timestamp += 1
+        queue.waitlist.push(priority, self.timestamp, userID)
+        row = self.users.row(userID)
+        self.users.waitlist[row] = queue.ordinal + 1
+        self.users.add(row, WAITING)
+        self.waitlisted_users.insert(userID, 1)
+
+    # Drop the bookkeeping of a user who already left the waitlist heap
+    def _leave_waitlist(self, userID):
+        self.users.discard(userID, self.users.find(userID), WAITING)
+        self.waitlisted_users.delete_node(userID)
+
+
+# Class answering the reservation queries of TicketEngine from one pinned
+# version of a persistent reservation store, so readers on other threads get
+# a consistent view without holding up the engine
+class PinnedReservations:
+    def __init__(self, version):
+        self.reserved_seats = version
+
+    reservations = TicketEngine.reservations
+    count_reserved = TicketEngine.count_reserved
+    nth_reservation = TicketEngine.nth_reservation
+
+    # Let go of the pinned version, so its nodes can be freed
+    def release(self):
+        self.reserved_seats.release()
@@ -0,0 +1,102 @@
+import sys
+import time
+import argparse
+import asyncio
+import random
+
+
+# Parse the command line options
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="ticketloadgen")
+    parser.add_argument("--host", default="127.0.0.1", help="server address")
+    parser.add_argument("--port", type=int, default=7878, help="server TCP port")
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket")
+    parser.add_argument("--event", default="load", help="event the requests go to")
+    parser.add_argument("--seats", type=int, default=100000, help="seats to open")
+    parser.add_argument("--clients", type=int, default=16, help="connections")
+    parser.add_argument("--requests", type=int, default=10000, help="per client")
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=32,
+        help="requests a client keeps in flight",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    return parser.parse_args(argv)
+
+
+async def connect(args):
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+# Read one response (its lines up to the empty line); return its text
+async def read_response(reader):
+    lines = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\n", b""):
+            return b"".join(lines).decode()
+        lines.append(line)
+
+
+# Send requests over one connection, keeping up to window of them in flight,
+# and return the latency of each one in seconds
+async def run_client(args, requests):
+    reader, writer = await connect(args)
+    sent_at = []
+    latencies = []
+    sent = 0
+    while len(latencies) < len(requests):
+        while sent < len(requests) and sent - len(latencies) < args.window:
+            writer.write(requests[sent])
+            sent_at.append(time.perf_counter())
+            sent += 1
+        await writer.drain()
+        await read_response(reader)
+        latencies.append(time.perf_counter() - sent_at[len(latencies)])
+    writer.close()
+    return latencies
+
+
+# Return the p-th percentile of sorted values
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    reader, writer = await connect(args)
+    writer.write(f"{args.event}: Initialize({args.seats})\n".encode())
+    await read_response(reader)
+    writer.close()
+
+    workloads = []
+    for client in range(args.clients):
+        base = client * args.requests
+        workloads.append(
+            [
+                f"{args.event}: Reserve({base + i + 1}, {rng.randint(1, 5)})\n".encode()
+                for i in range(args.requests)
+            ]
+        )
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_client(args, w) for w in workloads))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for result in results for latency in result)
+    print(
+        f"{len(latencies)} requests in {elapsed:.3f}s "
+        f"({len(latencies) / elapsed:.0f} requests/s), "
+        f"p50 {percentile(latencies, 50) * 1000:.3f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.3f} ms"
+    )
+
+
+def main():
+    asyncio.run(run(parse_args(sys.argv[1:])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from collections import namedtuple
+
+# Result objects returned by TicketEngine. They carry only the values needed
+# to describe an operation; turning them into output text is left to callers.
+
+# A user was given a seat
+Reserved = namedtuple("Reserved", "userID seatID")
+
+# A user was given count adjacent seats from seatID on; seatID is None when
+# no block of count free seats exists
+BlockReserved = namedtuple("BlockReserved", "userID seatID count")
+
+# A user was given a seat on hold until tick expires
+Held = namedtuple("Held", "userID seatID expires")
+
+# Outcome of confirming a hold; seatID is None when the user held nothing
+Confirmation = namedtuple("Confirmation", "userID seatID")
+
+# The clock moved to tick now; expired lists the Cancellation of every hold
+# that ran out, in order of expiry
+ClockAdvanced = namedtuple("ClockAdvanced", "now expired")
+
+# A user joined the waitlist
+Waitlisted = namedtuple("Waitlisted", "userID")
+
+# Outcome of a cancellation; promoted is the Reserved given the seat, or None
+Cancellation = namedtuple("Cancellation", "seatID userID status promoted")
+
+# A block of count seats was canceled; promoted lists the Reserved given to
+# waitlisted users, lowest seats first
+BlockCancellation = namedtuple("BlockCancellation", "seatID userID count promoted")
+
+# Seats made available and the waitlisted users promoted into them
+SeatsAdded = namedtuple("SeatsAdded", "count promoted")
+
+# Outcome of releasing the users in [userID1, userID2]
+Release = namedtuple("Release", "userID1 userID2 promoted")
+
+# Outcome of a user leaving the waitlist
+WaitlistExit = namedtuple("WaitlistExit", "userID removed")
+
+# Outcome of a waitlist priority change
+PriorityUpdate = namedtuple("PriorityUpdate", "userID priority updated")
+
+# Position in line of a user (None when not waiting); section names the
+# section whose waitlist the user is in, or is None for the shared waitlist
+QueuePosition = namedtuple("QueuePosition", "userID position section")
+
+# A waitlisted user and their position in line
+WaitlistEntry = namedtuple("WaitlistEntry", "position userID priority")
+
+# Free seats and waitlist length
+Availability = namedtuple("Availability", "seats waitlist")
+
+# Free seats and waitlist length of one named section
+SectionAvailability = namedtuple("SectionAvailability", "name seats waitlist")
+
+# State at the end of a what-if scenario run on a copy of the engine: free
+# seats, waitlist length and reserved seats, and the file holding its output
+ScenarioResult = namedtuple("ScenarioResult", "name seats waitlist reserved output")
+
+# Cancellation statuses
+CANCELED = "canceled"  # The seat was freed
+WRONG_SEAT = "wrong_seat"  # The user holds a different seat
+NOT_RESERVED = "not_reserved"  # The user holds no seat
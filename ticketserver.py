@@ -0,0 +1,266 @@
+import sys
+import io
+import argparse
+import asyncio
+from functools import partial
+from ticketengine import TicketEngine, WAITLISTS, STORES
+from commandparser import parse_line, coalesce_commands
+from eventshards import EVENT_TAG_RE
+from gatorTicketMaster import HANDLERS, BATCH_OUTPUTS
+
+# Event used for commands sent without an "eventID: " tag
+DEFAULT_EVENT = "default"
+
+# Most commands applied per batch
+BATCH_SIZE = 256
+
+# Length of one tick of the logical clock, in milliseconds
+TICK_MS = 1000
+
+# Commands served over the socket. Commands that touch files or fork the
+# server (Snapshot, Restore, Simulate) are left out, and so is Tick, since
+# the logical clock follows wall time. New handlers are not served until
+# they are added here.
+SERVED_COMMANDS = {
+    "Initialize",
+    "Available",
+    "Reserve",
+    "ReserveBlock",
+    "Hold",
+    "Confirm",
+    "Cancel",
+    "ExitWaitlist",
+    "UpdatePriority",
+    "AddSeats",
+    "WaitlistPosition",
+    "PrintWaitlist",
+    "PrintReservations",
+    "CountReserved",
+    "NthReservation",
+    "ReleaseSeats",
+}
+
+# Reservation queries that, with the persistent store, are answered from a
+# pinned version on a thread while the commands after them go on
+PINNED_COMMANDS = {"PrintReservations", "CountReserved", "NthReservation"}
+
+
+# Run one command handler against target; return its output text. Any
+# error is reported to the client that sent the command, so one bad command
+# cannot stop the worker that serves every other client of the event.
+def apply_command(target, name, args):
+    out = io.StringIO()
+    try:
+        HANDLERS[name](target, out, args)
+    except (ValueError, IndexError) as error:
+        out.write(f"Invalid command: {error}\n")
+    except Exception as error:
+        out.write(f"Command failed: {type(error).__name__}: {error}\n")
+    return out.getvalue()
+
+
+# Apply a coalesced run of commands through their batch renderer; return the
+# output text of each command. An error is reported to every command of the
+# run.
+def apply_batch(engine, name, batch):
+    try:
+        return BATCH_OUTPUTS[name](engine, batch)
+    except Exception as error:
+        return [f"Command failed: {type(error).__name__}: {error}\n"] * len(batch)
+
+
+# Answer a reservation query from a pinned version, then let go of it
+def read_pinned(pinned, name, args):
+    try:
+        return apply_command(pinned, name, args)
+    finally:
+        pinned.release()
+
+
+# Pass the output of a pinned read on to the future of its command
+def settle(future, reader):
+    if not future.cancelled():
+        future.set_result(reader.result())
+
+
+# Class owning the engine of one event. Commands from all connections go
+# through a single queue and are applied in order by one task, which takes
+# every queued command (up to batch_size) per wake-up; runs of Reserve and
+# UpdatePriority requests in it go to the engine as one batch, as in the
+# file mode, and each request still gets its own answer. A second task queues a
+# Tick for the ticks of wall time elapsed every tick_ms milliseconds, so
+# holds expire in batches between the commands. When the engine keeps its
+# reservations in the persistent store, reservation queries pin the version
+# they would have seen and are rendered on a thread, so a long
+# PrintReservations does not hold up the writes queued behind it.
+class EventWorker:
+    def __init__(self, engine, batch_size=BATCH_SIZE, tick_ms=TICK_MS):
+        self.engine = engine
+        self.pinnable = hasattr(engine.reserved_seats, "pin")
+        self.batch_size = batch_size
+        self.tick_seconds = tick_ms / 1000
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self.task = loop.create_task(self._run())
+        self.clock = loop.create_task(self._tick())
+
+    # Queue a command; return a future of its output text
+    def submit(self, name, args):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((name, args, future))
+        return future
+
+    # Apply queued commands batch by batch
+    async def _run(self):
+        queue = self.queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            futures = iter([future for _, _, future in batch])
+            commands = [(name, args) for name, args, _ in batch]
+            for name, args in coalesce_commands(commands, BATCH_OUTPUTS):
+                if type(args) is list:
+                    texts = apply_batch(self.engine, name, args)
+                    for text, future in zip(texts, futures):
+                        if not future.cancelled():
+                            future.set_result(text)
+                    continue
+                future = next(futures)
+                if self.pinnable and name in PINNED_COMMANDS:
+                    pinned = self.engine.pin_reservations()
+                    reader = loop.run_in_executor(None, read_pinned, pinned, name, args)
+                    reader.add_done_callback(partial(settle, future))
+                    continue
+                text = apply_command(self.engine, name, args)
+                if not future.cancelled():
+                    future.set_result(text)
+
+    # Advance the engine clock with wall time. Ticks are counted from the
+    # start, so a late wake-up does not make the clock drift.
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        ticks = 0
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            now = int((loop.time() - start) / self.tick_seconds)
+            if now > ticks:
+                self.submit("Tick", (now - ticks,))  # Nobody reads the output
+                ticks = now
+
+
+# Class serving the command grammar of the input files over a stream socket.
+# Each request is one line, optionally tagged "eventID: Command(...)"; the
+# response is the text the file mode would write for it, followed by an
+# empty line.
+class TicketServer:
+    def __init__(
+        self, waitlist="heap", store="rbtree", batch_size=BATCH_SIZE, tick_ms=TICK_MS
+    ):
+        self.waitlist = waitlist
+        self.store = store
+        self.batch_size = batch_size
+        self.tick_ms = tick_ms
+        self.events = {}  # Maps event ID to its EventWorker
+
+    # Return the worker of an event, starting one on first use
+    def worker(self, event):
+        worker = self.events.get(event)
+        if worker is None:
+            engine = TicketEngine(waitlist=self.waitlist, store=self.store)
+            worker = self.events[event] = EventWorker(
+                engine, self.batch_size, self.tick_ms
+            )
+        return worker
+
+    # Read the requests of one connection. Responses are written in request
+    # order by a separate task, so a client may pipeline many requests.
+    async def handle_client(self, reader, writer):
+        responses = asyncio.Queue()
+        sender = asyncio.get_running_loop().create_task(
+            self._send(responses, writer)
+        )
+        try:
+            async for raw in reader:
+                line = raw.decode(errors="replace")
+                if "\ufffd" in line:
+                    responses.put_nowait("Invalid command: request is not UTF-8\n")
+                    continue
+                tag, sep, command = line.partition(":")
+                if sep and EVENT_TAG_RE.fullmatch(tag.strip()):
+                    event, line = tag.strip(), command
+                else:
+                    event = DEFAULT_EVENT
+                parsed = parse_line(line)
+                if parsed is not None and parsed[0] == "Quit":
+                    responses.put_nowait("Program Terminated!!\n")
+                    break
+                if parsed is None or parsed[0] not in SERVED_COMMANDS:
+                    responses.put_nowait("")  # Ignored, as in the input files
+                else:
+                    responses.put_nowait(self.worker(event).submit(*parsed))
+        finally:
+            responses.put_nowait(None)
+            await sender
+            writer.close()
+
+    # Write the responses of a connection in request order
+    async def _send(self, responses, writer):
+        while True:
+            response = await responses.get()
+            if response is None:
+                break
+            if not isinstance(response, str):
+                response = await response
+            writer.write((response + "\n").encode())
+            if responses.empty():
+                await writer.drain()
+
+
+# Parse the command line options
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="ticketserver")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address to bind")
+    parser.add_argument("--port", type=int, default=7878, help="TCP port to bind")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket")
+    parser.add_argument("--waitlist", choices=sorted(WAITLISTS), default="heap")
+    parser.add_argument("--store", choices=sorted(STORES), default="rbtree")
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=BATCH_SIZE,
+        help="most commands of one event applied per batch",
+    )
+    parser.add_argument(
+        "--tick-ms",
+        type=int,
+        default=TICK_MS,
+        help="wall time of one tick of the hold clock, in milliseconds",
+    )
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    server = TicketServer(args.waitlist, args.store, args.batch, args.tick_ms)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle_client, args.unix)
+    else:
+        listener = await asyncio.start_server(
+            server.handle_client, args.host, args.port
+        )
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
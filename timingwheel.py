@@ -0,0 +1,113 @@
+# Slots per level of the wheel
+SLOTS = 64
+
+# Levels of the wheel; level l has slots of SLOTS ** l ticks
+LEVELS = 4
+
+
+# Class representing a hierarchical timing wheel of deadlines on a logical
+# clock. Level 0 has one slot per tick for the next SLOTS ticks, level 1 one
+# slot per SLOTS ticks for the next SLOTS ** 2 ticks, and so on; deadlines
+# beyond the top level wait in an overflow slot. Scheduling and canceling a
+# key are O(1) dict operations. When the clock reaches the start of a slot
+# of a higher level, its keys cascade down to the levels below, so every key
+# moves at most LEVELS times before it expires.
+class TimingWheel:
+    def __init__(self, now=0, slots=SLOTS, levels=LEVELS):
+        self.now = now  # Current tick
+        self.slots = slots
+        self.levels = levels
+        # wheel[level][slot] maps key -> (deadline, sequence)
+        self.wheel = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow = {}  # Keys due after the span of the top level
+        self.where = {}  # Maps key to the dict holding it
+        self.sequence = 0  # Orders keys scheduled for the same tick
+
+    # Schedule key to expire at tick deadline (replacing an earlier schedule).
+    # A deadline that already passed is due at the next tick.
+    def schedule(self, key, deadline):
+        self.cancel(key)
+        self.sequence += 1
+        self._place(key, max(deadline, self.now + 1), self.sequence)
+
+    # Forget the deadline of key; return whether it was scheduled
+    def cancel(self, key):
+        slot = self.where.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    # Return the deadline of key, or None when it is not scheduled
+    def deadline(self, key):
+        slot = self.where.get(key)
+        return None if slot is None else slot[key][0]
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def __len__(self):
+        return len(self.where)
+
+    # Return the (key, deadline) pairs of all scheduled keys
+    def entries(self):
+        return [(key, slot[key][0]) for key, slot in self.where.items()]
+
+    # Move the clock forward to tick now and return the expired keys, in
+    # order of deadline and then of scheduling
+    def advance(self, now):
+        expired = []
+        while self.now < now:
+            if not self.where:
+                self.now = now  # Nothing can expire: skip the empty ticks
+                break
+            if not any(self.wheel[0]):
+                # Nothing is due before the next cascade: skip to it
+                boundary = (self.now // self.slots + 1) * self.slots
+                self.now = min(boundary, now) - 1
+            self.now += 1
+            self._cascade()
+            slot = self.wheel[0][self.now % self.slots]
+            if slot:
+                due = sorted(slot.items(), key=lambda item: item[1][1])
+                slot.clear()
+                for key, _ in due:
+                    del self.where[key]
+                    expired.append(key)
+        return expired
+
+    # Put key in the slot of the lowest level whose span covers deadline,
+    # which is not before now
+    def _place(self, key, deadline, sequence):
+        delta = deadline - self.now
+        width = 1
+        for level in range(self.levels):
+            if delta < width * self.slots:
+                slot = self.wheel[level][(deadline // width) % self.slots]
+                break
+            width *= self.slots
+        else:
+            slot = self.overflow
+        slot[key] = (deadline, sequence)
+        self.where[key] = slot
+
+    # Re-place the keys of every higher-level slot that starts at now. The
+    # highest level goes first, since its keys may land in the lower slots
+    # that start at now too.
+    def _cascade(self):
+        top = 0
+        width = self.slots
+        while top < self.levels and self.now % width == 0:
+            top += 1
+            width *= self.slots
+        for level in range(top, 0, -1):
+            width //= self.slots
+            if level < self.levels:
+                slot = self.wheel[level][(self.now // width) % self.slots]
+            else:
+                slot = self.overflow
+            if slot:
+                moved = list(slot.items())
+                slot.clear()
+                for key, (deadline, sequence) in moved:
+                    self._place(key, deadline, sequence)
@@ -0,0 +1,116 @@
+from itertools import islice
+from minheapnode import MinHeapNode
+from rbtree import RedBlackTree
+
+
+# Class representing the waitlist as an order-statistic Red-Black Tree keyed
+# on (-priority, timestamp). It pops users in exactly the same order as
+# MinHeap, and since every node knows the size of its subtree it also tells
+# a user's position in line in O(log n) and lists the first k users in
+# O(log n + k) without touching the rest of the waitlist.
+class TreeWaitlist:
+    def __init__(self):
+        self.tree = RedBlackTree()  # Maps (-priority, timestamp) to the node
+        self.user_map = {}  # Maps userID to its node
+
+    # Add a new node to the waitlist
+    def push(self, priority, timestamp, userID):
+        node = MinHeapNode(
+            -priority, timestamp, userID
+        )  # Negative priority, same as MinHeap
+        self.tree.insert((node.priority, node.timestamp), node)
+        self.user_map[userID] = node
+
+    # Add a node for every (priority, timestamp, userID) entry; the nodes go
+    # into the tree as one sorted run
+    def push_many(self, entries):
+        nodes = sorted(
+            (MinHeapNode(-p, t, userID) for p, t, userID in entries),
+            key=lambda n: (n.priority, n.timestamp),
+        )
+        self.tree.insert_many([(n.priority, n.timestamp) for n in nodes], nodes)
+        for node in nodes:
+            self.user_map[node.userID] = node
+
+    # Remove and return the node with highest priority (earliest timestamp on ties)
+    def pop(self):
+        node = self.peek()
+        if node is not None:
+            self._discard(node)
+        return node
+
+    # Remove and return the first k nodes in pop order, which leave the tree
+    # in one bulk delete
+    def pop_many(self, k):
+        nodes = self.top(k)
+        self.tree.delete_many([(node.priority, node.timestamp) for node in nodes])
+        for node in nodes:
+            del self.user_map[node.userID]
+        return nodes
+
+    # Return the node pop() would return, without removing it
+    def peek(self):
+        first = self.tree.select(1)
+        return None if first is None else first[1]
+
+    # Remove a node with the given userID from the waitlist
+    def remove(self, userID):
+        node = self.user_map.get(userID)
+        if node is None:
+            return False  # User not found in waitlist
+        self._discard(node)
+        return True
+
+    # Update the priority of a user in the waitlist. The user keeps their
+    # timestamp, as in MinHeap.
+    def update_priority(self, userID, new_priority):
+        node = self.user_map.get(userID)
+        if node is None:
+            return False  # User not found in waitlist
+        self.tree.delete_node((node.priority, node.timestamp))
+        node.priority = -new_priority
+        self.tree.insert((node.priority, node.timestamp), node)
+        return True
+
+    # Apply update_priority to every (userID, new_priority) pair in order and
+    # return whether each user was found
+    def update_many(self, updates):
+        return [self.update_priority(userID, p) for userID, p in updates]
+
+    # Return the 1-based position of the user in pop order, or None when the
+    # user is not waiting
+    def position(self, userID):
+        node = self.user_map.get(userID)
+        if node is None:
+            return None
+        return self.tree.rank((node.priority, node.timestamp)) + 1
+
+    # Return the first k nodes in pop order
+    def top(self, k):
+        return [node for _, node in islice(self.tree.iter_inorder(), k)]
+
+    # Return the (priority, timestamp, userID) entries in pop order
+    def entries(self):
+        return [
+            (-node.priority, node.timestamp, node.userID)
+            for _, node in self.tree.iter_inorder()
+        ]
+
+    # Replace the waitlist with the given (priority, timestamp, userID)
+    # entries. Entries saved by entries() are already sorted, so the tree is
+    # built in O(n).
+    def load(self, entries):
+        nodes = sorted(
+            (MinHeapNode(-p, t, userID) for p, t, userID in entries),
+            key=lambda n: (n.priority, n.timestamp),
+        )
+        self.tree.load_sorted([(n.priority, n.timestamp) for n in nodes], nodes)
+        self.user_map = {node.userID: node for node in nodes}
+
+    # Unlink a node from the tree and forget its user
+    def _discard(self, node):
+        self.tree.delete_node((node.priority, node.timestamp))
+        del self.user_map[node.userID]
+
+    def __len__(self):
+        return len(self.user_map)
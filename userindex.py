@@ -0,0 +1,162 @@
+import sys
+from array import array
+
+# State flags of a user
+SEATED = 1  # Holds a seat or a block
+WAITING = 2  # Is in a waitlist
+
+# Heap slot of a user that is in no MinHeap
+NO_SLOT = -1
+
+# User IDs are used as rows directly while they stay below DENSE_SLACK times
+# the number of rows requested so far, plus DENSE_MIN
+DENSE_MIN = 1 << 16
+DENSE_SLACK = 4
+
+# Sparse columns are shrunk once they hold more than SHRINK_SLACK times as
+# many rows as are in use, and at least SHRINK_MIN rows
+SHRINK_MIN = 1 << 12
+SHRINK_SLACK = 4
+
+
+# Class representing the per-user state of an event as parallel array
+# columns indexed by row: the user's seat (the first seat of a block), the
+# index of their node in a MinHeap, the ordinal + 1 of the section whose
+# waitlist holds them, and their state flags. While user IDs are dense, a
+# user's row is their ID and a lookup is a bounds check; once an ID shows
+# up far beyond the users seen so far, rows are handed out through a dict
+# instead and rows of users without any state are reused. Sparse columns
+# only shrink through shrink(); dense columns never do.
+class UserIndex:
+    def __init__(self):
+        self.rows = None  # Maps userID to its row once IDs are sparse
+        self.free_rows = array("q")  # Rows that can be reused (sparse mode)
+        self.requests = 0  # Calls to row(); bounds the dense capacity
+        self.count = 0  # Users with a state flag set
+        self.seat = array("q")  # Seat held by the user (0 = none)
+        self.slot = array("q")  # Index of the user's node in a MinHeap
+        self.waitlist = array("l")  # Ordinal + 1 of the user's waitlist
+        self.flags = bytearray()  # SEATED | WAITING
+
+    # Return the row of userID, or -1 when the user has none
+    def find(self, userID):
+        if self.rows is None:
+            return userID if 0 <= userID < len(self.flags) else -1
+        return self.rows.get(userID, -1)
+
+    # Return the row of userID, giving the user one if needed
+    def row(self, userID):
+        self.requests += 1
+        if self.rows is None:
+            if 0 <= userID < len(self.flags):
+                return userID
+            if 0 <= userID < DENSE_SLACK * self.requests + DENSE_MIN:
+                self._grow(max(2 * len(self.flags), userID + 1))
+                return userID
+            self._hash()
+        row = self.rows.get(userID)
+        if row is None:
+            if not self.free_rows:
+                self._grow(max(2 * len(self.flags), 1))
+            row = self.rows[userID] = self.free_rows.pop()
+        return row
+
+    # Set a state flag of the user in row
+    def add(self, row, flag):
+        if not self.flags[row]:
+            self.count += 1
+        self.flags[row] |= flag
+
+    # Clear a state flag of userID, whose row is row
+    def discard(self, userID, row, flag):
+        flags = self.flags[row] & ~flag
+        self.flags[row] = flags
+        if not flags:
+            self.count -= 1
+            if self.rows is not None:
+                self.release(userID, row)
+
+    # Give the row of userID back once it holds no state (sparse mode only)
+    def release(self, userID, row):
+        if self.rows is None:
+            return
+        if not self.flags[row] and self.slot[row] == NO_SLOT:
+            del self.rows[userID]
+            self.free_rows.append(row)
+
+    # Return the seat of userID, or None when the user holds none
+    def seat_of(self, userID):
+        row = self.find(userID)
+        if row < 0 or not self.flags[row] & SEATED:
+            return None
+        return self.seat[row]
+
+    # Forget every user. The columns are emptied in place, since MinHeaps
+    # keep a reference to the slot column.
+    def clear(self):
+        self.rows = None
+        del self.free_rows[:]
+        self.requests = self.count = 0
+        for column in (self.seat, self.slot, self.waitlist, self.flags):
+            del column[:]
+
+    # Renumber the rows in use from 0 and cut the columns down to twice their
+    # number, once they have fallen well below the size of the columns
+    # (sparse mode only). Returns a list mapping every old row in use to its
+    # new row, for the rows MinHeap nodes remember, or None when nothing
+    # changed.
+    def shrink(self):
+        rows, size = self.rows, len(self.flags)
+        if rows is None or size < SHRINK_MIN or SHRINK_SLACK * len(rows) >= size:
+            return None
+        moved = [-1] * size
+        old_rows = list(rows.values())
+        for new, old in enumerate(old_rows):
+            moved[old] = new
+        # The columns are replaced in place, since MinHeaps keep a reference
+        # to the slot column
+        for column in (self.seat, self.slot, self.waitlist):
+            column[:] = array(column.typecode, [column[old] for old in old_rows])
+        self.flags[:] = bytes([self.flags[old] for old in old_rows])
+        self.rows = dict(zip(rows, range(len(old_rows))))
+        del self.free_rows[:]
+        self._grow(2 * len(old_rows))
+        return moved
+
+    # Extend every column to size rows; new rows hold no state
+    def _grow(self, size):
+        old = len(self.flags)
+        extra = size - old
+        self.seat.extend(array("q", [0]) * extra)
+        self.slot.extend(array("q", [NO_SLOT]) * extra)
+        self.waitlist.extend(array("l", [0]) * extra)
+        self.flags.extend(bytes(extra))
+        if self.rows is not None:
+            # Hand out the lowest new rows first
+            self.free_rows.extend(range(size - 1, old - 1, -1))
+
+    # Switch to sparse mode: the rows in use keep their numbers and every
+    # other row becomes free
+    def _hash(self):
+        flags, slot = self.flags, self.slot
+        in_use = [row for row in range(len(flags)) if flags[row] or slot[row] >= 0]
+        self.rows = dict(zip(in_use, in_use))
+        used = set(in_use)
+        self.free_rows = array(
+            "q", [row for row in range(len(flags) - 1, -1, -1) if row not in used]
+        )
+
+    # Return the memory held by the index in bytes
+    def memory_usage(self):
+        columns = (self.seat, self.slot, self.waitlist, self.free_rows)
+        total = sum(c.itemsize * len(c) for c in columns) + len(self.flags)
+        if self.rows is not None:
+            total += sys.getsizeof(self.rows)
+            total += sum(
+                sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.rows.items()
+            )
+        return total
+
+    # Return the number of users holding a seat or waiting
+    def __len__(self):
+        return self.count
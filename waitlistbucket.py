@@ -0,0 +1,52 @@
+import heapq
+from collections import OrderedDict
+
+
+# Class representing the FIFO bucket of waitlisted users sharing one priority
+class WaitlistBucket:
+    def __init__(self):
+        self.fifo = OrderedDict()  # userID -> node, in increasing timestamp order
+        self.tail = None  # Largest timestamp appended to fifo since it was empty
+        self.late = []  # Min-heap of (timestamp, userID) for out-of-order arrivals
+        self.late_nodes = {}  # Maps userID to node for entries in late
+
+    # Add a node, appending in O(1) when it is newer than everything in fifo
+    def add(self, node):
+        if self.tail is None or node.timestamp > self.tail:
+            self.fifo[node.userID] = node
+            self.tail = node.timestamp
+        else:
+            # A user moved here by a priority update keeps their older timestamp
+            self.late_nodes[node.userID] = node
+            heapq.heappush(self.late, (node.timestamp, node.userID))
+
+    # Remove the node of the given user
+    def remove(self, userID):
+        if self.fifo.pop(userID, None) is None:
+            del self.late_nodes[userID]  # Its heap entry is dropped lazily
+        if not self.fifo:
+            self.tail = None
+
+    # Return the node with the smallest timestamp without removing it
+    def peek(self):
+        late = self.late
+        while late:
+            timestamp, userID = late[0]
+            node = self.late_nodes.get(userID)
+            if node is not None and node.timestamp == timestamp:
+                break
+            heapq.heappop(late)  # Stale entry
+        head = next(iter(self.fifo.values())) if self.fifo else None
+        if late and (head is None or late[0][0] < head.timestamp):
+            return self.late_nodes[late[0][1]]
+        return head
+
+    # Remove and return the node with the smallest timestamp
+    def pop(self):
+        node = self.peek()
+        self.remove(node.userID)
+        return node
+
+    # Return the number of nodes in the bucket
+    def __len__(self):
+        return len(self.fifo) + len(self.late_nodes)
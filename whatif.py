@@ -0,0 +1,78 @@
+import gc
+import os
+import pickle
+from collections import deque
+
+
+# Return True when scenarios can be forked on this platform
+def can_fork():
+    return hasattr(os, "fork")
+
+
+# Call run(engine, scenario) for every scenario, each in a child process
+# forked from this one, at most jobs at a time. A child starts from the
+# engine exactly as it is now and shares its memory copy-on-write, so no
+# scenario pays for a replay or a deep copy, and nothing a scenario changes
+# reaches the engine here. Returns what each call returned, in scenario
+# order, or the exception it raised; results must be picklable.
+def run_forked(engine, scenarios, run, jobs=None):
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    running = deque()  # (pid, read end of its pipe) of the running children
+    results = []
+    # Objects the garbage collector tracks carry a header it writes to on
+    # every pass; freezing them keeps a child's collections from copying
+    # every page of the engine
+    gc.collect()
+    gc.freeze()
+    try:
+        for scenario in scenarios:
+            if len(running) == jobs:
+                results.append(_collect(*running.popleft()))
+            running.append(_fork(engine, scenario, run))
+        while running:
+            results.append(_collect(*running.popleft()))
+    finally:
+        gc.unfreeze()
+        for pid, read_fd in running:
+            _collect(pid, read_fd)  # A fork failed; reap the rest
+    return results
+
+
+# Fork a child that runs one scenario and pickles its result into a pipe;
+# return the child's pid and the read end of the pipe
+def _fork(engine, scenario, run):
+    read_fd, write_fd = os.pipe()
+    try:
+        pid = os.fork()
+    except OSError:
+        os.close(read_fd)
+        os.close(write_fd)
+        raise
+    if pid:
+        os.close(write_fd)
+        return pid, read_fd
+    # Child: never return into the caller's stack, and leave the buffers
+    # inherited from the parent (its output file included) unflushed
+    status = 1
+    try:
+        os.close(read_fd)
+        try:
+            result = run(engine, scenario)
+        except Exception as error:
+            result = error
+        with os.fdopen(write_fd, "wb") as f:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+        status = 0
+    finally:
+        os._exit(status)
+
+
+# Wait for a child and return the result it sent
+def _collect(pid, read_fd):
+    with os.fdopen(read_fd, "rb") as f:
+        data = f.read()
+    _, status = os.waitpid(pid, 0)
+    if not data:
+        code = os.waitstatus_to_exitcode(status)
+        return ChildProcessError(f"scenario process exited with status {code}")
+    return pickle.loads(data)
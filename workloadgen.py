@@ -0,0 +1,110 @@
+import sys
+import random
+import argparse
+from ticketengine import TicketEngine
+from ticketresults import Reserved
+
+# Operation mixes: relative weight of each kind of command
+MIXES = {
+    # On-sale burst: almost only reservations against a limited pool
+    "onsale": {"reserve": 90, "cancel": 4, "available": 6},
+    # Cancel churn: every cancellation hands the seat to the waitlist
+    "churn": {"reserve": 45, "cancel": 45, "exit": 5, "available": 5},
+    # Rare ReleaseSeats over a large share of the user IDs
+    "release": {"reserve": 80, "cancel": 18, "release": 2},
+    # Priority-update storm over a long waitlist
+    "priority": {"reserve": 30, "update": 65, "exit": 5},
+    # Big AddSeats blocks that drain the waitlist
+    "drain": {"reserve": 95, "add": 5},
+}
+
+# Highest user priority generated
+MAX_PRIORITY = 10
+
+
+# Yield the command lines of a workload of ops commands in the given mix.
+# The commands are run against a TicketEngine while they are generated, so
+# cancellations name real reservations and exits name waitlisted users.
+def generate(mix, ops, seed=0, seats=None):
+    rng = random.Random(seed)
+    kinds = list(MIXES[mix])
+    weights = list(MIXES[mix].values())
+    engine = TicketEngine()
+    seats = ops // 4 if seats is None else seats
+    holders = []  # Users that were given a seat (some may have lost it since)
+    next_user = 1
+
+    engine.initialize(seats)
+    yield f"Initialize({seats})\n"
+    for kind in rng.choices(kinds, weights, k=ops):
+        if kind == "reserve":
+            userID = next_user
+            next_user += 1
+            priority = rng.randint(1, MAX_PRIORITY)
+            if isinstance(engine.reserve(userID, priority), Reserved):
+                holders.append(userID)
+            yield f"Reserve({userID}, {priority})\n"
+        elif kind == "cancel":
+            userID = _take_holder(rng, holders, engine)
+            if userID is None:
+                continue
+            seatID = engine.seat_of(userID)
+            result = engine.cancel(seatID, userID)
+            if result.promoted is not None:
+                holders.append(result.promoted.userID)
+            yield f"Cancel({seatID}, {userID})\n"
+        elif kind == "exit":
+            userID = rng.randint(1, next_user)
+            engine.exit_waitlist(userID)
+            yield f"ExitWaitlist({userID})\n"
+        elif kind == "update":
+            userID = rng.randint(1, next_user)
+            priority = rng.randint(1, MAX_PRIORITY)
+            engine.update_priority(userID, priority)
+            yield f"UpdatePriority({userID}, {priority})\n"
+        elif kind == "add":
+            count = rng.randint(1, max(1, len(engine.waitlist)))
+            result = engine.add_seats(count)
+            holders.extend(promoted.userID for promoted in result.promoted)
+            yield f"AddSeats({count})\n"
+        elif kind == "release":
+            userID1 = rng.randint(1, next_user)
+            userID2 = userID1 + rng.randint(0, next_user // 4)
+            result = engine.release_seats(userID1, userID2)
+            holders.extend(promoted.userID for promoted in result.promoted)
+            yield f"ReleaseSeats({userID1}, {userID2})\n"
+        else:
+            yield "Available()\n"
+    yield "Quit()\n"
+
+
+# Remove and return a random user that still holds a seat, or None
+def _take_holder(rng, holders, engine):
+    while holders:
+        idx = rng.randrange(len(holders))
+        holders[idx], holders[-1] = holders[-1], holders[idx]
+        userID = holders.pop()
+        if engine.seat_of(userID) is not None:
+            return userID
+    return None
+
+
+# Parse the command line options
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="workloadgen")
+    parser.add_argument("mix", choices=sorted(MIXES), help="operation mix")
+    parser.add_argument("ops", type=int, help="number of commands")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--seats", type=int, help="seats opened by Initialize (default: ops / 4)"
+    )
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    sys.stdout.writelines(generate(args.mix, args.ops, args.seed, args.seats))
+
+
+if __name__ == "__main__":
+    main()
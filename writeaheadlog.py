@@ -0,0 +1,221 @@
+import os
+import struct
+import time
+from snapshot import write_snapshot, read_snapshot
+
+# File header: magic and format version. The header is followed by a
+# snapshot of the state the log starts from, and then by the records.
+HEADER = struct.Struct("<8sI")
+MAGIC = b"GTMWAL\0\0"
+VERSION = 5
+
+# One record per mutating command: opcode and three 64-bit arguments (unused
+# ones are 0). A command with an argument beyond 64 bits sets WIDE_FLAG in
+# the opcode instead and is followed by its three arguments, each as its
+# length in bytes and its little-endian two's complement bytes. Commands
+# naming a section set SECTION_FLAG in the opcode and are followed by the
+# length of the utf-8 name and the name itself.
+RECORD = struct.Struct("<Bqqq")
+OPCODE = struct.Struct("<B")
+INT_LENGTH = struct.Struct("<H")
+NAME_LENGTH = struct.Struct("<H")
+SECTION_FLAG = 0x80
+WIDE_FLAG = 0x40
+
+# Logged commands, in opcode order
+LOGGED_COMMANDS = (
+    "Initialize",
+    "Reserve",
+    "ReserveBlock",
+    "Cancel",
+    "ExitWaitlist",
+    "UpdatePriority",
+    "AddSeats",
+    "ReleaseSeats",
+    "Hold",
+    "Confirm",
+    "Tick",
+)
+OPCODES = {name: op for op, name in enumerate(LOGGED_COMMANDS)}
+
+# Default group commit limits
+GROUP_RECORDS = 64
+GROUP_MS = 10
+
+
+# Class representing an append-only log of the mutating commands of a run.
+# Records are collected in memory and written with one fsync per group of
+# group_records records, or earlier once the oldest pending record is
+# group_ms old. That age is only checked when the next record arrives:
+# there is no timer, so records appended just before the input goes idle
+# stay unsynced until the next record, commit() or close(). A file run never
+# idles, and close() at its end commits the rest.
+# After compact_records records the log is due to be folded into a snapshot.
+class WriteAheadLog:
+    def __init__(
+        self,
+        path,
+        engine,
+        group_records=GROUP_RECORDS,
+        group_ms=GROUP_MS,
+        compact_records=0,
+    ):
+        self.path = path
+        self.group_records = group_records
+        self.group_seconds = group_ms / 1000
+        self.compact_records = compact_records  # 0 = never compact
+        self.pending = bytearray()  # Encoded records not written yet
+        self.pending_count = 0
+        self.oldest = 0.0  # When the oldest pending record was added
+        self.records = 0  # Records appended since the log was last compacted
+        self.file = None
+        self.compact(engine)  # The log starts from the current state
+
+    # Add the command to the log. Call this before the command is applied.
+    def append(self, name, args):
+        if self.pending_count == 0:
+            self.oldest = time.monotonic()
+        op = OPCODES[name]
+        section = None
+        if args and type(args[-1]) is str:
+            section = args[-1].encode()
+            args = args[:-1]
+            op |= SECTION_FLAG
+        args += (0,) * (3 - len(args))
+        try:
+            self.pending += RECORD.pack(op, *args)
+        except struct.error:
+            self.pending += _encode_wide(op | WIDE_FLAG, args)
+        if section is not None:
+            self.pending += NAME_LENGTH.pack(len(section)) + section
+        self.pending_count += 1
+        self.records += 1
+        if (
+            self.pending_count >= self.group_records
+            or time.monotonic() - self.oldest >= self.group_seconds
+        ):
+            self.commit()
+
+    # Write the pending records and fsync them as one group
+    def commit(self):
+        if not self.pending_count:
+            return
+        self.file.write(self.pending)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending.clear()
+        self.pending_count = 0
+
+    # Fold the log into a snapshot of the engine. The new log is written to a
+    # temporary file and renamed over the old one, so a crash leaves either
+    # the old or the new log, never a mix of both. Snapshots hold 64-bit
+    # columns: state with a larger ID is not compacted, and the records keep
+    # going to the old log.
+    def compact(self, engine):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION))
+                write_snapshot(engine, f)
+                f.flush()
+                os.fsync(f.fileno())
+        except OverflowError:
+            os.remove(temp_path)
+            if self.file is None:
+                raise
+            self.records = 0  # Try again after another compact_records
+            return
+        # Pending records are already part of the engine state
+        self.pending.clear()
+        self.pending_count = 0
+        if self.file is not None:
+            self.file.close()
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, "ab")
+        self.records = 0
+
+    # Return True when the log has grown enough to be compacted
+    def compaction_due(self):
+        return 0 < self.compact_records <= self.records
+
+    # Commit the pending records and close the log
+    def close(self):
+        self.commit()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Encode a record whose arguments do not all fit in 64 bits
+def _encode_wide(op, args):
+    record = bytearray(OPCODE.pack(op))
+    for value in args:
+        data = value.to_bytes(value.bit_length() // 8 + 1, "little", signed=True)
+        record += INT_LENGTH.pack(len(data)) + data
+    return record
+
+
+# Decode the arguments of a record written by _encode_wide from data at
+# offset. Returns the arguments and the offset after them, or None when the
+# record is cut short.
+def _decode_wide(data, offset):
+    args = []
+    for _ in range(3):
+        if offset + INT_LENGTH.size > len(data):
+            return None
+        (length,) = INT_LENGTH.unpack_from(data, offset)
+        offset += INT_LENGTH.size
+        if offset + length > len(data):
+            return None
+        value = int.from_bytes(data[offset : offset + length], "little", signed=True)
+        args.append(value)
+        offset += length
+    return args, offset
+
+
+# Load the snapshot at the start of the log at path into the engine, and
+# return the logged commands as a list of (name, args). A record cut short by
+# a crash at the end of the log is ignored.
+def replay_log(engine, path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION):
+            raise ValueError("not a write-ahead log")
+        read_snapshot(engine, f)
+        data = f.read()
+    commands = []
+    offset = 0
+    while offset < len(data):
+        op = data[offset]
+        if op & WIDE_FLAG:
+            decoded = _decode_wide(data, offset + OPCODE.size)
+            if decoded is None:
+                break
+            (first, second, third), offset = decoded
+        elif offset + RECORD.size <= len(data):
+            op, first, second, third = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+        else:
+            break
+        name = LOGGED_COMMANDS[op & ~(SECTION_FLAG | WIDE_FLAG)]
+        if name in ("Initialize", "ExitWaitlist", "AddSeats", "Confirm", "Tick"):
+            args = (first,)
+        elif name in ("ReserveBlock", "Hold"):
+            args = (first, second, third)
+        else:
+            args = (first, second)
+        if op & SECTION_FLAG:
+            if offset + NAME_LENGTH.size > len(data):
+                break
+            (length,) = NAME_LENGTH.unpack_from(data, offset)
+            offset += NAME_LENGTH.size
+            if offset + length > len(data):
+                break
+            args += (data[offset : offset + length].decode(),)
+            offset += length
+        commands.append((name, args))
+    return commands